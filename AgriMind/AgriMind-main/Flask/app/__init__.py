@@ -1,28 +1,83 @@
 # Flask/app/__init__.py
 
+import time
+_import_started = time.perf_counter()
+
 import os
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from datetime import datetime
+from collections import deque
+import csv
+import io
+import json
 import uuid
 import logging
 
-from .database import db
-from .services import fetch_weather_data, fetch_soil_data
-from ml.crop_recommender.predict import predict_top_crops_from_features
-from ml.yield_predictor.yield_model_training import predict_yield_for_crops
+from .database import db, configure_engine, create_schema, engine_options
+from .models import PredictionHistory
+from .services import fetch_weather_data, fetch_soil_data, weather_prefetcher
+from .runtime import memory_footprint, startup_timings
+from .cache import cache_stats
+from .metrics import instrument, metrics_response
+from .inference import crop_feature_row, recommend_crops, predict_yields, warmup
+from .analysis import FARM_ANALYZE_DEADLINE, analyze_farm
+from .auth import admin_required
+from .routes import main
+from .agribot import agribot_bp
+
+startup_timings["import_ms"] = round((time.perf_counter() - _import_started) * 1000, 1)
 
 # -----------------------------
-# In-memory history storage
+# Prediction history
 # -----------------------------
-history = []
+# Rows are stored in the database (shared by all workers, indexed by time). This
+# process only keeps a ring buffer of the latest entries, served if the database
+# cannot be queried.
+HISTORY_BUFFER_SIZE = int(os.environ.get("HISTORY_BUFFER_SIZE", "200"))
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "50"))
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get("HISTORY_MAX_PAGE_SIZE", "500"))
+# Rows fetched per round trip by the streaming export
+HISTORY_EXPORT_BATCH = int(os.environ.get("HISTORY_EXPORT_BATCH", "1000"))
+
+history = deque(maxlen=HISTORY_BUFFER_SIZE)
+
+MAX_BATCH_ROWS = int(os.environ.get("PREDICT_MAX_BATCH_ROWS", "10000"))
+
+
+def _record_history(results):
+    """Persist one history row per recommendation, batches in full (a single multi-row INSERT)."""
+    now = datetime.utcnow()
+    rows = [
+        {"public_id": str(uuid.uuid4()), "created_at": now, "recommendations": response}
+        for response in results
+    ]
+    history.extend(
+        {"id": row["public_id"], "timestamp": now.isoformat(), "recommendations": row["recommendations"]}
+        for row in rows[-HISTORY_BUFFER_SIZE:]
+    )
+
+    try:
+        db.session.execute(db.insert(PredictionHistory), rows)
+        db.session.commit()
+    except Exception as e:
+        # History must never fail the prediction itself
+        db.session.rollback()
+        logging.getLogger(__name__).warning("Could not persist prediction history: %s", e)
+
 
 def create_app():
+    """
+    Build the app: config, routes and blueprints only. Tables and models are not
+    touched here; see initialize().
+    """
+    started = time.perf_counter()
     load_dotenv()
 
     app = Flask(__name__)
     CORS(app)
+    instrument(app)
 
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
@@ -35,12 +90,34 @@ def create_app():
     if not database_url:
         logger.warning("DATABASE_URL not set, using local SQLite")
         database_url = "sqlite:///agrimind.db"
+    elif database_url.startswith("postgres"):
+        # Render hands out postgres://, which SQLAlchemy no longer accepts; pin the
+        # psycopg2 driver from requirements.txt
+        scheme, sep, rest = database_url.partition("://")
+        if scheme in ("postgres", "postgresql"):
+            database_url = "postgresql+psycopg2" + sep + rest
+        try:
+            import psycopg2  # noqa
+        except ImportError:
+            logger.warning("PostgreSQL requested but psycopg2 not installed. Using SQLite instead.")
+            database_url = "sqlite:///agrimind.db"
 
     app.config["SQLALCHEMY_DATABASE_URI"] = database_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-key")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url)
+    # Signs session tokens (app/auth.py); login is refused until it is set
+    app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY")
+    if not app.config["SECRET_KEY"]:
+        logger.warning("SECRET_KEY not set, login is disabled")
 
     db.init_app(app)
+    configure_engine(app)
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create the database tables."""
+        create_schema(app)
+        print("Database tables created")
 
     # -----------------------------
     # Routes
@@ -53,29 +130,34 @@ def create_app():
     def predict():
         data = request.get_json() or {}
 
+        # Batch mode: {"rows": [{N, P, K, ...}, ...], "k": 3}
+        rows = data.get("rows")
+        batch = rows is not None
+
+        if batch and isinstance(rows, list) and len(rows) > MAX_BATCH_ROWS:
+            return jsonify({"error": f"At most {MAX_BATCH_ROWS} rows per request"}), 400
+
         try:
-            X = [[
-                float(data["N"]),
-                float(data["P"]),
-                float(data["K"]),
-                float(data["temperature"]),
-                float(data["rainfall"]),
-                float(data["pH"]),
-                float(data["humidity"]),
-            ]]
+            if batch:
+                if not isinstance(rows, list) or not rows:
+                    raise ValueError("rows must be a non-empty list")
+                X = [crop_feature_row(row) for row in rows]
+            else:
+                X = [crop_feature_row(data)]
+            k = int(data.get("k", 3))
         except Exception:
             return jsonify({"error": "Invalid input values"}), 400
 
-        crops = predict_top_crops_from_features(X)
-        response = [{"crop": c, "prob": float(p)} for c, p in crops]
+        results = [
+            [{"crop": c, "prob": float(p)} for c, p in crops]
+            for crops in recommend_crops(X, k=k)
+        ]
 
-        history.append({
-            "id": str(uuid.uuid4()),
-            "timestamp": datetime.utcnow().isoformat(),
-            "recommendations": response
-        })
+        _record_history(results)
 
-        return jsonify(response), 200
+        if batch:
+            return jsonify({"results": results}), 200
+        return jsonify(results[0]), 200
 
     @app.route("/predict_yield", methods=["POST"])
     def predict_yield():
@@ -87,12 +169,132 @@ def create_app():
         if not numeric_features or not crops:
             return jsonify({"error": "Missing inputs"}), 400
 
-        predictions = predict_yield_for_crops(numeric_features, crops)
+        predictions = predict_yields(numeric_features, crops)
         return jsonify({"yield_predictions": predictions}), 200
 
     @app.route("/history")
     def get_history():
-        return jsonify(history), 200
+        # Newest first; pass next_cursor back as ?cursor= for the following page
+        try:
+            limit = int(request.args.get("limit", HISTORY_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "Invalid limit"}), 400
+        # A cursor we cannot read must not silently restart from page 1
+        cursor = request.args.get("cursor")
+        if cursor is not None:
+            try:
+                cursor = int(cursor)
+                if cursor < 1:
+                    raise ValueError(cursor)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+
+        query = db.select(PredictionHistory).order_by(PredictionHistory.id.desc()).limit(limit + 1)
+        if cursor is not None:
+            query = query.where(PredictionHistory.id < cursor)
+
+        try:
+            rows = db.session.execute(query).scalars().all()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning("History query failed, serving in-memory buffer: %s", e)
+            recent = list(history)[::-1][:limit]
+            return jsonify({"items": recent, "next_cursor": None, "source": "memory"}), 200
+
+        next_cursor = rows[limit - 1].id if len(rows) > limit else None
+        return jsonify({
+            "items": [row.to_dict() for row in rows[:limit]],
+            "next_cursor": next_cursor,
+        }), 200
+
+    @app.route("/history/export")
+    def export_history():
+        """
+        Stream the whole history (oldest first) as NDJSON or CSV.
+
+        ?format=ndjson|csv, optional ?since= / ?until= ISO timestamps (since inclusive).
+        Rows come from a server-side cursor in HISTORY_EXPORT_BATCH chunks, so memory
+        stays flat however large the table is and bytes start flowing immediately.
+        CSV is long format: one line per recommended crop.
+        """
+        fmt = request.args.get("format", "ndjson")
+        if fmt not in ("ndjson", "csv"):
+            return jsonify({"error": "format must be ndjson or csv"}), 400
+
+        query = db.select(PredictionHistory).order_by(PredictionHistory.id)
+        try:
+            if request.args.get("since"):
+                query = query.where(PredictionHistory.created_at >= datetime.fromisoformat(request.args["since"]))
+            if request.args.get("until"):
+                query = query.where(PredictionHistory.created_at < datetime.fromisoformat(request.args["until"]))
+        except ValueError:
+            return jsonify({"error": "since/until must be ISO 8601 timestamps"}), 400
+
+        query = query.execution_options(stream_results=True, yield_per=HISTORY_EXPORT_BATCH)
+
+        def ndjson_rows():
+            for row in db.session.execute(query).scalars():
+                yield json.dumps(row.to_dict()) + "\n"
+
+        def csv_rows():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+
+            def flush():
+                data = buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+                return data
+
+            writer.writerow(["id", "timestamp", "rank", "crop", "prob"])
+            yield flush()
+            for row in db.session.execute(query).scalars():
+                timestamp = row.created_at.isoformat()
+                for rank, rec in enumerate(row.recommendations, start=1):
+                    writer.writerow([row.public_id, timestamp, rank, rec.get("crop"), rec.get("prob")])
+                yield flush()
+
+        if fmt == "csv":
+            return Response(
+                stream_with_context(csv_rows()),
+                mimetype="text/csv",
+                headers={"Content-Disposition": "attachment; filename=prediction_history.csv"},
+            )
+        return Response(
+            stream_with_context(ndjson_rows()),
+            mimetype="application/x-ndjson",
+            headers={"Content-Disposition": "attachment; filename=prediction_history.ndjson"},
+        )
+
+    @app.route("/metrics")
+    @admin_required
+    def metrics():
+        # Prometheus text format, aggregated over all gunicorn workers. Operational
+        # endpoints below need ADMIN_TOKEN, like the cache admin routes (app/auth.py)
+        return metrics_response()
+
+    @app.route("/api/cache/stats")
+    @admin_required
+    def get_cache_stats():
+        return jsonify(cache_stats()), 200
+
+    @app.route("/api/system/startup")
+    @admin_required
+    def system_startup():
+        return jsonify(startup_timings), 200
+
+    @app.route("/api/system/memory")
+    @admin_required
+    def system_memory():
+        # Footprint of the worker serving this request; see gunicorn.conf.py for all workers
+        return jsonify(memory_footprint()), 200
+
+    @app.route("/api/system/prefetch")
+    @admin_required
+    def system_prefetch():
+        # Hot weather buckets of the worker serving this request
+        return jsonify({"weather": weather_prefetcher.status()}), 200
 
     @app.route("/api/weather", methods=["POST"])
     def weather():
@@ -110,8 +312,59 @@ def create_app():
             float(d.get("longitude", 73.8567))
         ))
 
+    @app.route("/api/farm/analyze", methods=["POST"])
+    def farm_analyze():
+        # Weather + soil + crops + yields in one round trip; see app/analysis.py
+        d = request.get_json() or {}
+        try:
+            result = analyze_farm(
+                float(d.get("latitude", 18.5204)),
+                float(d.get("longitude", 73.8567)),
+                overrides=d.get("overrides"),
+                k=int(d.get("k", 3)),
+                deadline=d.get("deadline", FARM_ANALYZE_DEADLINE),
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result), 200
+
+    # Auth, AgriBot and AI ask; the JSON "/" above takes precedence over main's page
+    app.register_blueprint(main)
+    app.register_blueprint(agribot_bp)
+
+    startup_timings["create_app_ms"] = round((time.perf_counter() - started) * 1000, 1)
     return app
 
 
-# Gunicorn entry point
-app = create_app()
+def initialize(app):
+    """
+    One-time startup work kept out of import and create_app(): create missing
+    tables and load both models. gunicorn.conf.py runs it in the master before
+    forking, so workers start with everything in place.
+    """
+    logger = logging.getLogger(__name__)
+
+    started = time.perf_counter()
+    try:
+        create_schema(app)
+    except Exception as e:
+        # Requests that need the tables fail on their own; prediction keeps working
+        logger.warning("Could not create database tables: %s", e)
+    startup_timings["schema_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    startup_timings.update(warmup())
+    logger.info("startup: %s", ", ".join(f"{k}={v}" for k, v in startup_timings.items()))
+    return startup_timings
+
+
+_app = None
+
+
+def __getattr__(name):
+    # Gunicorn entry point (app:app), built on first access instead of at import
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
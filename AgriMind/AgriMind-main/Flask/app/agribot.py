@@ -1,54 +1,51 @@
-import os
-import requests
 from flask import Blueprint, request, jsonify
 
+from .llm import (
+    GEMINI_API_KEY, LLMError, answer_cache, answer_key, caching_stream,
+    gemini_generate, gemini_generate_stream, stream_response, use_fake, wants_stream,
+)
+
 agribot_bp = Blueprint("agribot", __name__)
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_MODEL = "gemini-1.5-flash"
-GEMINI_URL = (
-    f"https://generativelanguage.googleapis.com/v1/models/"
-    f"{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
-)
+# Gemini config lives in app/llm.py. Send {"stream": true} (or Accept: text/event-stream)
+# to get tokens as Server-Sent Events; add ?format=ndjson for NDJSON lines.
 
-@agribot_bp.route("/api/agribot", methods=["POST"])
-def agribot():
-    data = request.get_json()
+@agribot_bp.route("/api/ai/ask", methods=["POST"])
+def ai_ask():
+    data = request.get_json() or {}
     question = data.get("question", "").strip()
 
     if not question:
         return jsonify({"error": "Question is required"}), 400
 
-    payload = {
-        "contents": [
-            {
-                "role": "user",
-                "parts": [{"text": question}]
-            }
-        ]
-    }
+    if not GEMINI_API_KEY and not use_fake():
+        return jsonify({"error": "Gemini API key not configured"}), 500
+
+    # Repeat questions are answered from the cache without calling Gemini
+    cache_key = answer_key("gemini", question)
+    cached = answer_cache.get(cache_key)
 
     try:
-        response = requests.post(
-            GEMINI_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=20
-        )
-
-        if response.status_code != 200:
-            return jsonify({
-                "error": "Gemini API error",
-                "details": response.text
-            }), 500
-
-        result = response.json()
-        answer = (
-            result["candidates"][0]
-            ["content"]["parts"][0]["text"]
-        )
+        if wants_stream(data):
+            fmt = request.args.get("format", data.get("format", "sse"))
+            if cached is not None:
+                return stream_response([cached], fmt)
+            tokens = caching_stream(gemini_generate_stream(question), cache_key)
+            return stream_response(tokens, fmt)
+
+        if cached is not None:
+            answer = cached
+        else:
+            answer = gemini_generate(question)
+            answer_cache.set(cache_key, answer)
 
         return jsonify({"answer": answer})
 
+    except LLMError as e:
+        return jsonify({
+            "error": str(e),
+            "details": e.details
+        }), 500
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
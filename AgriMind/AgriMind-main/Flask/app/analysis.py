@@ -0,0 +1,165 @@
+# Flask/app/analysis.py
+#
+# One-round-trip farm analysis: weather and soil are fetched concurrently under a
+# single deadline, then fed straight into crop recommendation and yield prediction.
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .services import WEATHER_FALLBACK, fetch_soil_data, fetch_weather_data
+from .inference import PREDICT_FIELDS, crop_feature_row, recommend_crops, predict_yields
+
+# Client deadlines are clamped to [FARM_ANALYZE_MIN_DEADLINE, FARM_ANALYZE_DEADLINE] seconds
+FARM_ANALYZE_DEADLINE = float(os.environ.get("FARM_ANALYZE_DEADLINE", "12"))
+FARM_ANALYZE_MIN_DEADLINE = float(os.environ.get("FARM_ANALYZE_MIN_DEADLINE", "0.5"))
+FARM_FANOUT_WORKERS = int(os.environ.get("FARM_FANOUT_WORKERS", "8"))
+
+# Used for yield inputs the client does not send
+DEFAULT_FARM_INPUTS = {"soil_moisture": 30.0, "sunlight_hours": 7.0, "farm_size": 1.0}
+
+# Same values fetch_soil_data falls back to
+SOIL_FALLBACK = {"N": 100, "P": 45, "K": 190, "pH": 6.5, "source": "MOCK_FALLBACK"}
+
+SOIL_FIELDS = ("N", "P", "K", "pH")
+WEATHER_FIELDS = ("temperature", "humidity", "rainfall")
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    # One bounded pool per process; threads do not survive a gunicorn fork
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=FARM_FANOUT_WORKERS, thread_name_prefix="farm-fanout")
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _finite(name, value):
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    return value
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def analyze_farm(latitude, longitude, overrides=None, k=3, deadline=FARM_ANALYZE_DEADLINE):
+    """
+    Weather + soil + top-k crops + their yields in one call.
+
+    `overrides` may set any of N, P, K, pH, temperature, humidity, rainfall,
+    soil_moisture, sunlight_hours, farm_size; an upstream whose every field is
+    overridden is not called at all. Without an override, rainfall is the 5-day
+    forecast precipitation sum. Upstreams that miss the deadline fall back to
+    the same mock values /api/weather and /api/soil use.
+
+    Raises ValueError for overrides that are not an object of finite numbers and
+    for a non-finite deadline; other deadlines are clamped to the allowed range.
+    """
+    if overrides is None:
+        overrides = {}
+    if not isinstance(overrides, dict):
+        raise ValueError("overrides must be an object")
+    overrides = {key: _finite(key, value) for key, value in overrides.items() if value is not None}
+    deadline = min(max(_finite("deadline", deadline), FARM_ANALYZE_MIN_DEADLINE), FARM_ANALYZE_DEADLINE)
+    started = time.perf_counter()
+    timings = {}
+    sources = {}
+
+    # -----------------------------
+    # Stage 1: upstream fan-out under one deadline
+    # -----------------------------
+    futures = {}
+    executor = _get_executor()
+    if not all(field in overrides for field in WEATHER_FIELDS):
+        futures["weather"] = executor.submit(fetch_weather_data, latitude, longitude)
+    if not all(field in overrides for field in SOIL_FIELDS):
+        futures["soil"] = executor.submit(fetch_soil_data, latitude, longitude)
+
+    fetch_start = time.perf_counter()
+    wait(futures.values(), timeout=deadline)
+    timings["fetch_ms"] = _ms(fetch_start)
+
+    weather, soil = None, None
+    for name, future in futures.items():
+        if future.done() and future.exception() is None:
+            result = future.result()
+            sources[name] = "live"
+        else:
+            result = WEATHER_FALLBACK if name == "weather" else SOIL_FALLBACK
+            sources[name] = "timeout" if not future.done() else "error"
+        if name == "weather":
+            weather = result
+            # fetch_weather_data serves mock sections when Open-Meteo is unavailable
+            freshness = result.get("freshness", {})
+            if sources[name] == "live" and any(
+                freshness.get(section, {}).get("source") == "fallback" for section in WEATHER_FALLBACK
+            ):
+                sources[name] = "fallback"
+        else:
+            soil = result
+            if sources[name] == "live":
+                sources[name] = result.get("source", "live")
+
+    # -----------------------------
+    # Stage 2: assemble model inputs (overrides win)
+    # -----------------------------
+    features = {}
+    if soil is not None:
+        features.update({field: soil.get(field) for field in SOIL_FIELDS})
+    if weather is not None:
+        current = weather.get("current", {})
+        features["temperature"] = current.get("Temperature")
+        features["humidity"] = current.get("Humidity")
+        features["rainfall"] = sum(v for v in weather.get("forecast_5day", {}).get("Rainfall_Sum", []) if v is not None)
+    features.update(DEFAULT_FARM_INPUTS)
+    features.update(overrides)
+
+    missing = [field for field in PREDICT_FIELDS if features.get(field) is None]
+    if missing:
+        raise ValueError(f"Missing inputs: {', '.join(missing)}")
+
+    # -----------------------------
+    # Stage 3: crop recommendation
+    # -----------------------------
+    stage = time.perf_counter()
+    # Row in the model's training column order, fields matched by name
+    top_crops = recommend_crops([crop_feature_row(features)], k=k)[0]
+    timings["recommend_ms"] = _ms(stage)
+
+    # -----------------------------
+    # Stage 4: yields for all top-k crops in one vectorized call
+    # -----------------------------
+    from ml.yield_predictor.yield_predict import NUMERIC_FEATURES, get_predictor
+
+    stage = time.perf_counter()
+    known = set(get_predictor().crop_index)
+    yield_crops = [crop.lower() for crop, _ in top_crops if crop.lower() in known]
+    # The yield model spells pH as "ph"
+    numeric = [float(features["pH" if name == "ph" else name]) for name in NUMERIC_FEATURES]
+    yields = predict_yields(numeric, yield_crops) if yield_crops else {}
+    timings["yield_ms"] = _ms(stage)
+
+    timings["total_ms"] = _ms(started)
+
+    return {
+        "location": {"latitude": latitude, "longitude": longitude},
+        "weather": weather,
+        "soil": soil,
+        "features": features,
+        "recommendations": [
+            {"crop": crop, "prob": float(prob), "yield": yields.get(crop.lower())}
+            for crop, prob in top_crops
+        ],
+        "sources": sources,
+        "timings": timings,
+    }
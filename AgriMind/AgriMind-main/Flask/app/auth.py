@@ -0,0 +1,163 @@
+# Flask/app/auth.py
+#
+# Signed, expiring session tokens. Login pays for the password hash once and
+# returns a token; every later request is checked by verifying the token's
+# signature with SECRET_KEY, without touching the users table.
+#
+# A token lives SESSION_TOKEN_TTL seconds and can be exchanged for a fresh one at
+# /farmer/refresh, but never past SESSION_MAX_AGE after the password was entered.
+# Without a real SECRET_KEY (unset, or the old "dev-secret-key" default anyone can
+# sign with) no token is issued or accepted.
+#
+# Admin and operational endpoints (cache admin, /metrics, /api/cache/stats,
+# /api/system/*) require ADMIN_TOKEN, sent as X-Admin-Token or as a Bearer token
+# (what Prometheus' scrape `authorization` setting sends). Unset, they are closed.
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+SESSION_TOKEN_TTL = int(os.environ.get("SESSION_TOKEN_TTL", str(7 * 24 * 3600)))
+SESSION_MAX_AGE = int(os.environ.get("SESSION_MAX_AGE", str(30 * 24 * 3600)))
+TOKEN_SALT = "agrimind-session"
+INSECURE_SECRET_KEYS = frozenset(["", "dev-secret-key"])
+
+# Password hashing is slow on purpose. At most AUTH_HASH_WORKERS checks run at once
+# and AUTH_HASH_QUEUE more may wait; past that, logins get a 503 instead of piling
+# up and taking CPU from the prediction endpoints.
+AUTH_HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", "2"))
+AUTH_HASH_QUEUE = int(os.environ.get("AUTH_HASH_QUEUE", "32"))
+AUTH_HASH_TIMEOUT = float(os.environ.get("AUTH_HASH_TIMEOUT", "10"))
+
+
+class AuthBusy(Exception):
+    """Too many password checks are already queued."""
+
+
+class AuthNotConfigured(Exception):
+    """SECRET_KEY is unset or still a publicly known default."""
+
+
+# -----------------------------
+# Tokens
+# -----------------------------
+_serializers = {}
+
+
+def tokens_enabled():
+    return (current_app.config.get("SECRET_KEY") or "") not in INSECURE_SECRET_KEYS
+
+
+def _serializer():
+    if not tokens_enabled():
+        raise AuthNotConfigured()
+    secret = current_app.config["SECRET_KEY"]
+    serializer = _serializers.get(secret)
+    if serializer is None:
+        serializer = _serializers[secret] = URLSafeTimedSerializer(secret, salt=TOKEN_SALT)
+    return serializer
+
+
+def issue_token(user, auth_time=None):
+    """
+    Signed token for `user`. `auth_time` is when the password was last checked:
+    now for a login, carried over unchanged by a refresh.
+    """
+    auth_time = int(time.time()) if auth_time is None else int(auth_time)
+    return _serializer().dumps({"uid": user.id, "email": user.email, "name": user.name, "auth_time": auth_time})
+
+
+def token_expires_in(auth_time):
+    """Seconds a token issued now stays valid: its TTL, cut short by the session's max age."""
+    return max(0, min(SESSION_TOKEN_TTL, int(auth_time + SESSION_MAX_AGE - time.time())))
+
+
+def verify_token(token, max_age=SESSION_TOKEN_TTL):
+    """
+    Token payload ({uid, email, name, auth_time}) if the signature is valid, the
+    token unexpired and the session within SESSION_MAX_AGE; else None.
+    """
+    if not token:
+        return None
+    try:
+        payload = _serializer().loads(token, max_age=max_age)
+    except (SignatureExpired, BadSignature, AuthNotConfigured):
+        return None
+    auth_time = payload.get("auth_time")
+    if not isinstance(auth_time, int) or time.time() - auth_time > SESSION_MAX_AGE:
+        return None
+    return payload
+
+
+def token_from_request():
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else None
+
+
+def login_required(view):
+    """Reject requests without a valid session token; the payload is in g.user."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        payload = verify_token(token_from_request())
+        if payload is None:
+            return jsonify({"error": "Authentication required"}), 401
+        g.user = payload
+        return view(*args, **kwargs)
+    return wrapper
+
+
+
+def is_admin():
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        return False
+    sent = request.headers.get("X-Admin-Token") or token_from_request() or ""
+    return hmac.compare_digest(sent, admin_token)
+
+
+def admin_required(view):
+    """Reject requests that do not carry ADMIN_TOKEN."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+# -----------------------------
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(AUTH_HASH_WORKERS + AUTH_HASH_QUEUE)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="auth-hash")
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def check_password(user, password):
+    """Run user.check_password on the hash pool; raises AuthBusy when the queue is full."""
+    if not _slots.acquire(blocking=False):
+        raise AuthBusy()
+    try:
+        future = _get_executor().submit(user.check_password, password)
+    except Exception:
+        _slots.release()
+        raise
+    # The slot is held until the hash finishes, even if this request stops waiting
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=AUTH_HASH_TIMEOUT)
+    except FutureTimeout:
+        raise AuthBusy()
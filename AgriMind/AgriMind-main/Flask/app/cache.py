@@ -0,0 +1,408 @@
+# Flask/app/cache.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Directory for persistent cache files (defaults to Flask/instance)
+CACHE_DIR = os.environ.get(
+    "CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance"),
+)
+
+# name -> cache, so stats can be reported from one place
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register(cache):
+    with _registry_lock:
+        _registry[cache.name] = cache
+    return cache
+
+
+def cache_stats():
+    """Stats of every registered cache, keyed by cache name."""
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+# Called as hook(cache_name, backend, hit) on every lookup (see app/metrics.py)
+_lookup_hook = None
+
+
+def set_lookup_hook(hook):
+    global _lookup_hook
+    _lookup_hook = hook
+
+
+def _record_lookup(name, backend, hit):
+    if _lookup_hook is not None:
+        _lookup_hook(name, backend, hit)
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache with size-bounded LRU eviction and optional TTL.
+
+    ttl=None means entries never expire; maxsize=0 disables the cache.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> [value, expires_at, hits]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        value = default
+        hit = False
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[1] is None or entry[1] > now:
+                    self._data.move_to_end(key)
+                    entry[2] += 1
+                    value, hit = entry[0], True
+                else:
+                    del self._data[key]
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        _record_lookup(self.name, "memory", hit)
+        return value
+
+    def peek(self, key, default=None):
+        """Like get(), for housekeeping: no hit/miss stats, no LRU reordering."""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            return default
+        return entry[0]
+
+    def set(self, key, value, ttl=None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            entry = self._data.get(key)
+            self._data[key] = [value, expires_at, entry[2] if entry else 0]
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def top(self, n=10):
+        """The n entries with the most hits, as (key, hits) pairs."""
+        with self._lock:
+            counts = [(key, entry[2]) for key, entry in self._data.items()]
+        return sorted(counts, key=lambda item: item[1], reverse=True)[:n]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class SQLiteCache:
+    """
+    Persistent JSON cache in a SQLite file, shared by every worker on the host and
+    kept across restarts. Values must be JSON-serializable.
+    """
+
+    def __init__(self, name, path, ttl=None, maxsize=None):
+        self.name = name
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # The file is opened on first use, not here: importing a module that builds a
+        # cache must not touch the disk. If it cannot be opened the cache turns into
+        # a no-op (every get misses) and callers run on their memory tier alone.
+        self.available = True
+        self._ready = False
+
+    def _create_schema(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+        if "hits" not in columns:
+            # Cache files created before per-entry hit counts
+            conn.execute("ALTER TABLE cache ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at)")
+
+    def _connect(self):
+        # One connection per thread and per process (connections must not cross a fork)
+        if not self.available:
+            raise sqlite3.OperationalError(f"{self.path} is unavailable")
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            try:
+                if not self._ready:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                if not self._ready:
+                    self._create_schema(conn)
+                    self._ready = True
+            except (OSError, sqlite3.Error) as e:
+                if not self._ready:
+                    self.available = False
+                    logger.warning("Cache %s: cannot open %s (%s), continuing without it", self.name, self.path, e)
+                raise sqlite3.OperationalError(str(e)) from e
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        _record_lookup(self.name, "sqlite", hit)
+
+    def get(self, key, default=None):
+        if not self.available:
+            return default
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                conn.execute("UPDATE cache SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                self._count(True)
+                return json.loads(row[0])
+        except sqlite3.Error:
+            pass
+        self._count(False)
+        return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET"
+                " value = excluded.value, expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (key, json.dumps(value), now + ttl if ttl else None, now),
+            )
+            if self.maxsize:
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    " SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.maxsize,),
+                )
+        except sqlite3.Error:
+            # A cache write failing must never fail the request
+            pass
+
+    def delete(self, key):
+        try:
+            self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        try:
+            self._connect().execute("DELETE FROM cache")
+        except sqlite3.Error:
+            pass
+
+    def __len__(self):
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def top(self, n=10):
+        """The n entries with the most hits, as (key, hits) pairs."""
+        try:
+            return [tuple(row) for row in self._connect().execute(
+                "SELECT key, hits FROM cache ORDER BY hits DESC LIMIT ?", (n,)
+            )]
+        except sqlite3.Error:
+            return []
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "available": self.available,
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class TieredCache:
+    """In-process LRU in front of an optional shared backend (e.g. SQLiteCache)."""
+
+    def __init__(self, name, memory, backend=None):
+        self.name = name
+        self.memory = memory
+        self.backend = backend
+
+    def get(self, key, default=None):
+        value = self.memory.get(key)
+        if value is None and self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return default if value is None else value
+
+    def set(self, key, value, ttl=None):
+        self.memory.set(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(key, value, ttl)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def __len__(self):
+        if self.backend is not None:
+            size = len(self.backend)
+            if self.backend.available:
+                return size
+        return len(self.memory)
+
+    def top(self, n=10):
+        """Most-hit entries; hits served by either tier are added together."""
+        counts = dict(self.memory.top(n))
+        if self.backend is not None:
+            for key, hits in self.backend.top(n):
+                counts[key] = counts.get(key, 0) + hits
+        return sorted(counts.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def stats(self):
+        stats = {"memory": self.memory.stats()}
+        if self.backend is not None:
+            stats["backend"] = self.backend.stats()
+        return stats
+
+
+class CacheGeneration:
+    """
+    Counter in a small file under CACHE_DIR, shared by every worker on the host.
+
+    Caches put current() in their keys, so bump() invalidates the entries of every
+    worker at once: old keys are never looked up again and age out through LRU
+    eviction and TTL. Reading it is one stat() per call.
+    """
+
+    def __init__(self, name, path=None):
+        self.name = name
+        self.path = path or os.path.join(CACHE_DIR, f"{name}.generation")
+        self._stamp = None
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def _read(self):
+        """(stamp, value) of the file as it is now; (None, 0) if it does not exist."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None, 0
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with open(self.path) as f:
+            return stamp, int(f.read().strip() or 0)
+
+    def current(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return 0
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            try:
+                stamp, value = self._read()
+            except (OSError, ValueError):
+                return self._value
+            with self._lock:
+                self._stamp, self._value = stamp, value
+        return self._value
+
+    def bump(self):
+        """Start a new generation; returns it."""
+        with self._lock:
+            try:
+                _, value = self._read()
+            except (OSError, ValueError):
+                value = self._value
+            value += 1
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(str(value))
+            # Atomic: readers see the old or the new file, never a partial one
+            os.replace(tmp_path, self.path)
+            st = os.stat(self.path)
+            self._stamp, self._value = (st.st_ino, st.st_mtime_ns, st.st_size), value
+        return value
+
+
+def build_cache(name, maxsize, ttl=None, backend="memory", path=None):
+    """
+    Build and register a cache from config values: an LRUCache, optionally
+    backed by a SQLiteCache file when backend == "sqlite".
+    """
+    memory = LRUCache(name, maxsize=maxsize, ttl=ttl)
+    if backend == "sqlite":
+        path = path or os.path.join(CACHE_DIR, f"{name}_cache.sqlite")
+        return register(TieredCache(name, memory, SQLiteCache(name, path, ttl=ttl)))
+    return register(memory)
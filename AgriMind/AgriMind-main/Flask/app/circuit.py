@@ -0,0 +1,111 @@
+# Flask/app/circuit.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from .metrics import CIRCUIT_STATE
+
+# Consecutive failures that open a circuit, and seconds it stays open before one
+# trial call is let through (half-open)
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", "30"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def is_upstream_failure(error):
+    """
+    Whether an exception from an upstream call counts against its circuit: transport
+    errors and 5xx responses do; 4xx responses (a bad request of ours) do not.
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, requests.exceptions.RequestException)
+
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker for one upstream.
+
+    After `failure_threshold` consecutive failures the circuit opens and allow()
+    returns False, so callers answer from cache or fallback at once instead of
+    waiting on timeouts. After `reset_timeout` a single trial call is allowed;
+    its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(0)
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def _acquire(self):
+        """(allowed, is_trial); caller holds the lock."""
+        state = self._state()
+        if state == CLOSED:
+            return True, False
+        if state == HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True, True
+        return False, False
+
+    def allow(self):
+        with self._lock:
+            return self._acquire()[0]
+
+    @contextmanager
+    def attempt(self):
+        """
+        allow() for one call, as a block that yields whether the call may go ahead.
+        A half-open trial that ends without record_success() or record_failure()
+        (an unexpected exception, a 4xx) is released on the way out, so the next
+        caller gets the trial instead of the circuit staying half-open for good.
+        """
+        with self._lock:
+            allowed, trial = self._acquire()
+        try:
+            yield allowed
+        finally:
+            if trial:
+                with self._lock:
+                    self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[CLOSED])
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+            state = self._state()
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+    def status(self):
+        with self._lock:
+            return {"state": self._state(), "consecutive_failures": self.failures}
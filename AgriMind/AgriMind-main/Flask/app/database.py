@@ -1,11 +1,71 @@
 # Flask/app/database.py
+import os
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 db = SQLAlchemy()
 
+# -----------------------------
+# Engine configuration
+# -----------------------------
+# PostgreSQL: connections kept per worker process, extra ones allowed under bursts,
+# checked before use (pre-ping) and replaced before the server or a proxy drops them.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") != "0"
+
+# SQLite: WAL lets readers run alongside the single writer, NORMAL sync is safe in
+# WAL mode, and writers wait up to the busy timeout for the lock instead of
+# failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured backend."""
+    if database_url.startswith("sqlite"):
+        # Python's sqlite3 module also waits on locks, in seconds
+        return {"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def configure_engine(app):
+    """Apply the SQLite pragmas to every new connection of the app's engine."""
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == "sqlite" and not event.contains(engine, "connect", _set_sqlite_pragmas):
+            event.listen(engine, "connect", _set_sqlite_pragmas)
+
+
+def create_schema(app):
+    """Create missing tables once at startup, then drop the connections so forked workers open their own."""
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+
 def init_db(app):
     """Initialize the database with the given Flask app."""
     db.init_app(app)
+    configure_engine(app)
     with app.app_context():
         db.create_all()
-    return db
\ No newline at end of file
+    return db
@@ -0,0 +1,77 @@
+# Flask/app/http_client.py
+#
+# One pooled, keep-alive HTTP session shared by every upstream integration
+# (SoilGrids, Open-Meteo, Gemini, Groq), so repeat calls reuse open TCP/TLS
+# connections instead of paying DNS + handshake each time.
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Number of distinct hosts to keep pools for, and connections kept open per host
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "20"))
+
+# Retries apply to idempotent requests (GET/HEAD) only; LLM POSTs are never replayed.
+# Only refused connections and retryable statuses are retried: a read timeout is
+# not, so a call never blocks for more than about one timeout.
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", "0.3"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Used when a caller does not pass its own timeout
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "20"))
+
+
+class PooledSession(requests.Session):
+    """requests.Session that never sends a request without a timeout."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        return super().request(method, url, **kwargs)
+
+
+def build_session():
+    retry = Retry(
+        total=HTTP_RETRIES,
+        read=0,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        # A long Retry-After would hold the request for as long; back off briefly instead
+        respect_retry_after_header=False,
+        # Hand the last response back to the caller instead of raising MaxRetryError
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = PooledSession()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    The process-wide session. Pools are per process: a worker forked from a
+    preloaded master builds its own instead of sharing the master's sockets.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = build_session()
+                _session_pid = pid
+    return _session
@@ -0,0 +1,155 @@
+# Flask/app/inference.py
+import os
+import time
+
+from .cache import build_cache
+from .metrics import observe_stage
+from ml.crop_recommender.model_training import FEATURES as CROP_FEATURES
+
+# Request field for each crop model input, in the model's training column order.
+# Requests spell ph as "pH".
+REQUEST_FIELD_NAMES = {"ph": "pH"}
+PREDICT_FIELDS = [REQUEST_FIELD_NAMES.get(feature, feature) for feature in CROP_FEATURES]
+
+# -----------------------------
+# Result cache configuration
+# -----------------------------
+# By default inputs are cached as they are. PREDICTION_CACHE_QUANTIZE=1 snaps them
+# to the steps below before lookup (and prediction), so near-identical vectors from
+# the same district share one entry. That is opt-in because it changes answers: on
+# the training CSV the top-3 order or probabilities differ for about one row in
+# five (top-1 is unchanged). A step of 0 keeps the raw value.
+QUANTIZE_INPUTS = os.environ.get("PREDICTION_CACHE_QUANTIZE", "0") != "0"
+DEFAULT_QUANTIZATION_STEPS = {
+    "N": 1.0, "P": 1.0, "K": 1.0,
+    "temperature": 0.1, "humidity": 0.5, "rainfall": 1.0,
+    "pH": 0.05, "ph": 0.05,
+    "soil_moisture": 0.5, "sunlight_hours": 0.1, "farm_size": 0.1,
+}
+
+
+def _parse_steps(spec):
+    """"temperature=0.5,rainfall=5" -> {"temperature": 0.5, "rainfall": 5.0}"""
+    steps = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        steps[name.strip()] = float(value)
+    return steps
+
+
+QUANTIZATION_STEPS = {
+    **(DEFAULT_QUANTIZATION_STEPS if QUANTIZE_INPUTS else {}),
+    **_parse_steps(os.environ.get("PREDICTION_CACHE_STEPS", "")),
+}
+
+# PREDICTION_CACHE_SIZE=0 turns the in-process tier off;
+# PREDICTION_CACHE_BACKEND=sqlite adds a file shared by all workers on the host.
+prediction_cache = build_cache(
+    "predictions",
+    maxsize=int(os.environ.get("PREDICTION_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("PREDICTION_CACHE_TTL", "86400")),
+    backend=os.environ.get("PREDICTION_CACHE_BACKEND", "memory"),
+    path=os.environ.get("PREDICTION_CACHE_PATH"),
+)
+
+
+# -----------------------------
+# Lazy model modules
+# -----------------------------
+# numpy, joblib and scikit-learn are imported, and the models loaded, on first use
+# (or up front by warmup()), so importing the app does not pay for them.
+def _crop_predict():
+    from ml.crop_recommender import predict
+    return predict
+
+
+def _yield_predict():
+    from ml.yield_predictor import yield_predict
+    return yield_predict
+
+
+def warmup():
+    """Load both models now (e.g. in the gunicorn master before forking); returns ms per model."""
+    timings = {}
+    start = time.perf_counter()
+    _crop_predict()
+    timings["crop_model_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    start = time.perf_counter()
+    _yield_predict().get_predictor()
+    timings["yield_model_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return timings
+
+
+def crop_feature_row(data):
+    """Crop model input row from a mapping of request fields, matched by name."""
+    return [float(data[field]) for field in PREDICT_FIELDS]
+
+
+def quantize(values, names):
+    snapped = []
+    for value, name in zip(values, names):
+        step = QUANTIZATION_STEPS.get(name, 0.0)
+        value = float(value)
+        snapped.append(round(round(value / step) * step, 10) if step else value)
+    return snapped
+
+
+def _key(values):
+    return ",".join(format(v, ".10g") for v in values)
+
+
+# -----------------------------
+# Cached model calls
+# -----------------------------
+def recommend_crops(X, k=3):
+    """
+    Top-k crops for each feature row (PREDICT_FIELDS order), served from the cache
+    where possible; all misses go to the model in one batch call.
+    """
+    crop_predict = _crop_predict()
+    version = crop_predict.reload_if_changed()
+    rows = [quantize(row, PREDICT_FIELDS) for row in X]
+    # "crop2": rows used to be cached in a different column order
+    keys = [f"crop2:{version}:{k}:{_key(row)}" for row in rows]
+
+    results = [prediction_cache.get(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        with observe_stage("crop_inference"):
+            computed = crop_predict.predict_top_crops_batch([rows[i] for i in missing], k=k)
+        for i, crops in zip(missing, computed):
+            results[i] = crops
+            prediction_cache.set(keys[i], crops)
+
+    # The SQLite tier hands back JSON lists instead of tuples
+    return [[(crop, prob) for crop, prob in crops] for crops in results]
+
+
+def predict_yields(numeric_input, crops):
+    """Yield per crop, cached per (numeric inputs, crop); misses share one predict call."""
+    yield_predict = _yield_predict()
+    predictor = yield_predict.get_predictor(check_version=True)
+    if len(numeric_input) != len(yield_predict.NUMERIC_FEATURES):
+        raise ValueError(f"Numeric input must have {len(yield_predict.NUMERIC_FEATURES)} elements")
+
+    numeric = quantize(numeric_input, yield_predict.NUMERIC_FEATURES)
+    prefix = f"yield:{predictor.version}:{_key(numeric)}"
+    crop_names = [crop.lower() for crop in crops]
+
+    results = {}
+    missing = []
+    for crop in crop_names:
+        value = prediction_cache.get(f"{prefix}:{crop}")
+        if value is None:
+            missing.append(crop)
+        else:
+            results[crop] = value
+
+    if missing:
+        with observe_stage("yield_inference"):
+            computed = predictor.predict(numeric, missing)
+        for crop, value in computed.items():
+            results[crop] = value
+            prediction_cache.set(f"{prefix}:{crop}", value)
+
+    return {crop: results[crop] for crop in crop_names}
@@ -0,0 +1,449 @@
+# Flask/app/llm.py
+#
+# Upstream LLM calls for AgriBot (Groq) and AI ask (Gemini), blocking and streaming,
+# plus a local fake provider (LLM_PROVIDER=fake) so streaming works offline.
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+import requests
+
+from flask import Response, request, stream_with_context
+
+from .cache import CacheGeneration, build_cache
+from .circuit import CircuitBreaker, is_upstream_failure
+from .http_client import get_session
+from .metrics import track_upstream
+
+logger = logging.getLogger(__name__)
+
+# "fake" sends every LLM call to the local stub below instead of Groq/Gemini
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "").lower()
+FAKE_LLM_TOKEN_DELAY = float(os.environ.get("FAKE_LLM_TOKEN_DELAY", "0.02"))
+
+# =====================================================
+# GROQ CONFIG
+# =====================================================
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_URL = os.environ.get("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODEL = "llama-3.1-8b-instant"
+GROQ_TIMEOUT = 30
+
+# =====================================================
+# GEMINI CONFIG
+# =====================================================
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1/models")
+GEMINI_MODEL = "gemini-1.5-flash"
+GEMINI_TIMEOUT = 20
+
+
+def gemini_headers():
+    # The key goes in a header, never the URL: request URLs end up in exception
+    # messages and logs
+    return {"Content-Type": "application/json", "x-goog-api-key": GEMINI_API_KEY or ""}
+
+
+def scrub_key(text):
+    """text with the Gemini API key masked, for logging upstream errors."""
+    text = str(text)
+    return text.replace(GEMINI_API_KEY, "***") if GEMINI_API_KEY else text
+
+# Candidates tried in order until one answers (GEMINI_MODELS overrides, comma-separated)
+GEMINI_MODELS = [
+    name.strip() for name in os.environ.get(
+        "GEMINI_MODELS",
+        f"{GEMINI_MODEL},gemini-2.0-flash,gemini-2.0-flash-lite,gemini-2.5-flash,"
+        "gemini-1.5-flash-8b,gemini-1.5-pro,gemini-pro",
+    ).split(",") if name.strip()
+]
+# How long a working model is trusted before a background re-probe, how long a
+# model that returned 404 is skipped, and how long one that failed (transport error
+# or 5xx) is skipped
+GEMINI_MODEL_TTL = float(os.environ.get("GEMINI_MODEL_TTL", "3600"))
+GEMINI_DEAD_MODEL_TTL = float(os.environ.get("GEMINI_DEAD_MODEL_TTL", "21600"))
+GEMINI_FAILED_MODEL_TTL = float(os.environ.get("GEMINI_FAILED_MODEL_TTL", "60"))
+
+
+class LLMError(Exception):
+    """Upstream LLM call failed; `details` carries the upstream body."""
+
+    def __init__(self, message, details=None, status=500):
+        super().__init__(message)
+        self.details = details
+        self.status = status
+
+
+def use_fake():
+    return LLM_PROVIDER == "fake"
+
+
+# =====================================================
+# FAKE PROVIDER (offline)
+# =====================================================
+def fake_answer(question):
+    return (
+        f"AgriBot offline stub: you asked \"{question}\". "
+        "Test your soil pH, sow after the first good rains, and apply fertilizer in split doses."
+    )
+
+
+def fake_stream(question):
+    """Yields the stub answer word by word, like a real token stream."""
+    for i, word in enumerate(fake_answer(question).split(" ")):
+        if FAKE_LLM_TOKEN_DELAY:
+            time.sleep(FAKE_LLM_TOKEN_DELAY)
+        yield word if i == 0 else " " + word
+
+
+# =====================================================
+# SSE PARSING
+# =====================================================
+def iter_sse_data(response):
+    """Payloads of the `data:` lines of an upstream Server-Sent Events response."""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield line[len("data:"):].strip()
+
+
+# =====================================================
+# GROQ
+# =====================================================
+def groq_messages(system_prompt, question):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": question},
+    ]
+
+
+def _groq_post(system_prompt, question, stream):
+    payload = {
+        "model": GROQ_MODEL,
+        "messages": groq_messages(system_prompt, question),
+        "temperature": 0.4,
+    }
+    if stream:
+        payload["stream"] = True
+
+    # For streams this times the wait for the first byte, not the whole answer
+    with track_upstream("groq") as call:
+        r = get_session().post(
+            GROQ_URL,
+            headers={
+                "Authorization": f"Bearer {GROQ_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json=payload,
+            timeout=GROQ_TIMEOUT,
+            stream=stream,
+        )
+        call.status = r.status_code
+    if r.status_code != 200:
+        raise LLMError("Groq API error", r.text)
+    return r
+
+
+def groq_chat(system_prompt, question):
+    if use_fake():
+        return fake_answer(question)
+    return _groq_post(system_prompt, question, stream=False).json()["choices"][0]["message"]["content"]
+
+
+def groq_chat_stream(system_prompt, question):
+    """
+    Token generator for a Groq chat completion. The upstream request is made
+    before returning, so HTTP errors surface here rather than mid-stream.
+    """
+    if use_fake():
+        return fake_stream(question)
+    r = _groq_post(system_prompt, question, stream=True)
+
+    def tokens():
+        with r:
+            for data in iter_sse_data(r):
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+
+    return tokens()
+
+
+# =====================================================
+# GEMINI
+# =====================================================
+class GeminiModelResolver:
+    """
+    Process-wide memory of which Gemini model works.
+
+    The first model that answers is remembered for GEMINI_MODEL_TTL and tried
+    first, so the normal path is exactly one upstream call. Models that return
+    404 go on a negative cache for GEMINI_DEAD_MODEL_TTL, models whose call failed
+    for GEMINI_FAILED_MODEL_TTL. Once the TTL lapses the remembered model keeps
+    serving while a background thread re-probes the list.
+    """
+
+    def __init__(self, models, ttl=GEMINI_MODEL_TTL, dead_ttl=GEMINI_DEAD_MODEL_TTL,
+                 failed_ttl=GEMINI_FAILED_MODEL_TTL):
+        self.models = list(models)
+        self.ttl = ttl
+        self.dead_ttl = dead_ttl
+        self.failed_ttl = failed_ttl
+        self.resolved = None
+        self.resolved_at = 0.0
+        self.dead = {}  # model -> time it may be retried
+        self.failed = {}  # model -> time it may be retried
+        self._lock = threading.Lock()
+        self._probing = False
+
+    def candidates(self):
+        """Models to try, best first: the remembered one, then live candidates."""
+        now = time.time()
+        with self._lock:
+            resolved = self.resolved
+            if resolved is not None and self.failed.get(resolved, 0) > now:
+                resolved = None
+            live = [
+                m for m in self.models
+                if self.dead.get(m, 0) <= now and self.failed.get(m, 0) <= now and m != resolved
+            ]
+            stale = resolved is not None and now - self.resolved_at > self.ttl
+            start_probe = stale and not self._probing
+            if start_probe:
+                self._probing = True
+
+        if start_probe:
+            threading.Thread(target=self.probe, name="gemini-model-probe", daemon=True).start()
+        return ([resolved] if resolved else []) + live
+
+    def mark_ok(self, model):
+        with self._lock:
+            if model != self.resolved or time.time() - self.resolved_at > self.ttl:
+                self.resolved = model
+                self.resolved_at = time.time()
+            self.dead.pop(model, None)
+            self.failed.pop(model, None)
+
+    def mark_failed(self, model):
+        with self._lock:
+            self.failed[model] = time.time() + self.failed_ttl
+
+    def mark_dead(self, model):
+        with self._lock:
+            self.dead[model] = time.time() + self.dead_ttl
+            if self.resolved == model:
+                self.resolved = None
+
+    def probe(self):
+        """Re-check candidates with the (free) model metadata endpoint, in order."""
+        try:
+            for model in self.models:
+                try:
+                    r = get_session().get(
+                        f"{GEMINI_BASE_URL}/{model}", headers=gemini_headers(), timeout=GEMINI_TIMEOUT,
+                    )
+                except requests.exceptions.RequestException:
+                    continue
+                if r.status_code == 200:
+                    self.mark_ok(model)
+                    return model
+                if r.status_code == 404:
+                    self.mark_dead(model)
+            return None
+        finally:
+            with self._lock:
+                self._probing = False
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            return {
+                "resolved": self.resolved,
+                "resolved_age_seconds": round(now - self.resolved_at, 1) if self.resolved else None,
+                "dead": sorted(m for m, until in self.dead.items() if until > now),
+                "failed": sorted(m for m, until in self.failed.items() if until > now),
+            }
+
+
+gemini_models = GeminiModelResolver(GEMINI_MODELS)
+gemini_breaker = CircuitBreaker("gemini")
+
+
+def _gemini_post(question, stream):
+    method = "streamGenerateContent?alt=sse" if stream else "generateContent"
+    payload = {
+        "contents": [
+            {
+                "role": "user",
+                "parts": [{"text": question}]
+            }
+        ]
+    }
+
+    with gemini_breaker.attempt() as allowed:
+        # During an outage, fail at once instead of waiting out timeouts
+        if not allowed:
+            raise LLMError("Gemini unavailable", "Gemini is failing, try again shortly", status=503)
+
+        # Move to the next candidate on 404 (retired model). A transport error or 5xx
+        # is about Gemini, not the model: the model is skipped for a short while and
+        # the request fails, rather than waiting on every candidate in turn.
+        last_error = None
+        for model in gemini_models.candidates():
+            try:
+                with track_upstream("gemini") as call:
+                    response = get_session().post(
+                        f"{GEMINI_BASE_URL}/{model}:{method}",
+                        json=payload,
+                        headers=gemini_headers(),
+                        timeout=GEMINI_TIMEOUT,
+                        stream=stream,
+                    )
+                    call.status = response.status_code
+            except requests.exceptions.RequestException as e:
+                gemini_models.mark_failed(model)
+                if is_upstream_failure(e):
+                    gemini_breaker.record_failure()
+                # The exception text is for the server log only, never the client
+                logger.warning("Gemini request to %s failed: %s", model, scrub_key(e))
+                raise LLMError("Gemini request failed", "Could not reach Gemini, try again shortly")
+            if response.status_code == 404:
+                gemini_models.mark_dead(model)
+                last_error = response.text
+                continue
+            if response.status_code != 200:
+                if response.status_code >= 500:
+                    gemini_models.mark_failed(model)
+                    gemini_breaker.record_failure()
+                raise LLMError("Gemini API error", response.text)
+            gemini_models.mark_ok(model)
+            gemini_breaker.record_success()
+            return response
+
+    raise LLMError("No Gemini model available", last_error)
+
+
+def _gemini_text(result):
+    parts = result["candidates"][0]["content"].get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+def gemini_generate(question):
+    if use_fake():
+        return fake_answer(question)
+    return _gemini_text(_gemini_post(question, stream=False).json())
+
+
+def gemini_generate_stream(question):
+    """Token generator for a Gemini answer; HTTP errors surface before streaming starts."""
+    if use_fake():
+        return fake_stream(question)
+    response = _gemini_post(question, stream=True)
+
+    def tokens():
+        with response:
+            for data in iter_sse_data(response):
+                text = _gemini_text(json.loads(data))
+                if text:
+                    yield text
+
+    return tokens()
+
+
+# =====================================================
+# ANSWER CACHE
+# =====================================================
+# Farmers ask the same questions over and over ("best fertilizer for rice"), so answers
+# are cached on the normalized question text plus reply mode and language.
+# ANSWER_CACHE_BACKEND=sqlite adds a persistent tier shared by all workers.
+answer_cache = build_cache(
+    "agribot_answers",
+    maxsize=int(os.environ.get("ANSWER_CACHE_SIZE", "5000")),
+    ttl=float(os.environ.get("ANSWER_CACHE_TTL", str(7 * 24 * 3600))),
+    backend=os.environ.get("ANSWER_CACHE_BACKEND", "memory"),
+    path=os.environ.get("ANSWER_CACHE_PATH"),
+)
+# Part of every answer key; purge_answers() bumps it so all workers stop serving
+# the old answers, whatever tier they are held in
+answer_generation = CacheGeneration("agribot_answers")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """Case, punctuation and spacing do not change the question ("Best fertilizer for rice?")."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    # Drop punctuation and symbols by Unicode category, keeping combining marks
+    # (Devanagari vowel signs etc.) that a \w-based pattern would strip
+    text = "".join(" " if unicodedata.category(ch)[0] in "PS" else ch for ch in text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def answer_key(provider, question, reply_mode="same", lang=""):
+    return f"g{answer_generation.current()}:{provider}:{reply_mode}:{lang}:{normalize_question(question)}"
+
+
+def purge_answers():
+    """Invalidate cached answers in every worker; frees this worker's and the shared tier's space."""
+    generation = answer_generation.bump()
+    answer_cache.clear()
+    return generation
+
+
+def caching_stream(tokens, key):
+    """Pass tokens through and cache the full answer once the stream completes."""
+    answer = []
+    for token in tokens:
+        answer.append(token)
+        yield token
+    if answer:
+        answer_cache.set(key, "".join(answer))
+
+
+# =====================================================
+# STREAMING RESPONSES
+# =====================================================
+def wants_stream(data):
+    """Streaming is requested with {"stream": true} or Accept: text/event-stream."""
+    return bool(data.get("stream")) or request.accept_mimetypes.best == "text/event-stream"
+
+
+def stream_response(tokens, fmt="sse"):
+    """
+    Forward tokens to the client as they arrive.
+
+    sse:    data: {"token": ...} events, then `event: done` with the full answer
+    ndjson: {"token": ...} lines, then {"done": true, "answer": ...}
+    An upstream failure mid-stream ends with an `error` event / {"error": ...} line.
+    """
+    ndjson = fmt == "ndjson"
+
+    def encode(payload, event=None):
+        body = json.dumps(payload, ensure_ascii=False)
+        if ndjson:
+            return body + "\n"
+        return (f"event: {event}\n" if event else "") + f"data: {body}\n\n"
+
+    def generate():
+        answer = []
+        try:
+            for token in tokens:
+                answer.append(token)
+                yield encode({"token": token})
+        except Exception as e:
+            # Upstream exception text can carry URLs; it goes to the log, not the client
+            logger.warning("Answer stream failed: %s", scrub_key(e))
+            yield encode({"error": "Answer stream interrupted, please retry"}, event="error")
+            return
+        yield encode({"done": True, "answer": "".join(answer)}, event="done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson" if ndjson else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,150 @@
+# Flask/app/metrics.py
+#
+# Prometheus metrics, served as text at /metrics.
+#
+# Under gunicorn every worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+# (gunicorn.conf.py sets it up) and /metrics merges all of them, so the numbers
+# are the same whichever worker answers the scrape. Without that variable the
+# metrics of the current process are served.
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+
+from . import cache
+from ml import artifacts
+
+# Request latency is dominated by upstream calls, so buckets run up to 30 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Model inference is sub-millisecond to tens of milliseconds
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    "agrimind_http_request_duration_seconds", "Flask request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "agrimind_http_requests_in_flight", "Requests currently being handled",
+    multiprocess_mode="livesum",
+)
+STAGE_LATENCY = Histogram(
+    "agrimind_stage_duration_seconds", "Time spent in model inference and model loading",
+    ["stage"], buckets=STAGE_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    "agrimind_upstream_duration_seconds", "Upstream API call latency",
+    ["upstream", "outcome"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "agrimind_upstream_requests_in_flight", "Upstream API calls currently waiting",
+    ["upstream"], multiprocess_mode="livesum",
+)
+CIRCUIT_STATE = Gauge(
+    "agrimind_circuit_state", "Upstream circuit breaker state (0 closed, 1 half-open, 2 open); worst worker",
+    ["upstream"], multiprocess_mode="livemax",
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "agrimind_singleflight_calls_total", "Upstream fetches started (leader) or joined (shared)",
+    ["name", "role"],
+)
+PREFETCH_REFRESHES = Counter(
+    "agrimind_prefetch_refreshes_total", "Background refreshes queued for hot keys before they expire",
+    ["name"],
+)
+CACHE_LOOKUPS = Counter(
+    "agrimind_cache_lookups_total", "Cache lookups by cache, tier and result",
+    ["cache", "backend", "result"],
+)
+
+
+def multiprocess_enabled():
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+# -----------------------------
+# Timers
+# -----------------------------
+@contextmanager
+def observe_stage(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+class UpstreamCall:
+    """Set `status` to the HTTP status so the call is labelled 2xx/4xx/5xx."""
+    status = None
+
+
+@contextmanager
+def track_upstream(upstream):
+    call = UpstreamCall()
+    outcome = "error"
+    UPSTREAM_IN_FLIGHT.labels(upstream).inc()
+    start = time.perf_counter()
+    try:
+        yield call
+        outcome = f"{call.status // 100}xx" if call.status else "ok"
+    finally:
+        UPSTREAM_LATENCY.labels(upstream, outcome).observe(time.perf_counter() - start)
+        UPSTREAM_IN_FLIGHT.labels(upstream).dec()
+
+
+def _record_cache_lookup(name, backend, hit):
+    CACHE_LOOKUPS.labels(name, backend, "hit" if hit else "miss").inc()
+
+
+def _record_model_load(name, seconds):
+    STAGE_LATENCY.labels(f"{name}_model_load").observe(seconds)
+
+
+cache.set_lookup_hook(_record_cache_lookup)
+artifacts.on_load(_record_model_load)
+
+
+# -----------------------------
+# Flask integration
+# -----------------------------
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _after_request(response):
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        # Route template, not the raw path, to keep label cardinality bounded.
+        # Streamed bodies are timed to the first byte.
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.labels(request.method, route, str(response.status_code)).observe(
+            time.perf_counter() - start
+        )
+    return response
+
+
+def _teardown_request(exc):
+    REQUESTS_IN_FLIGHT.dec()
+
+
+def instrument(app):
+    """Time every request of `app` and count the ones in flight."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    return app
+
+
+def metrics_response():
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
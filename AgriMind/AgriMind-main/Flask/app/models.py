@@ -1,6 +1,7 @@
 # Flask/app/models.py
 from .database import db
 from datetime import datetime
+import uuid
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
@@ -21,4 +22,39 @@ class User(db.Model):
         return check_password_hash(self.password, password)
     
     def __repr__(self):
-        return f'<User {self.email}>'
\ No newline at end of file
+        return f'<User {self.email}>'
+
+
+# Built once and bound per call, so the compiled SQL is reused from SQLAlchemy's
+# statement cache on every login and registration
+_USER_BY_EMAIL = db.select(User).where(User.email == db.bindparam("email")).limit(1)
+_EMAIL_TAKEN = db.select(User.id).where(User.email == db.bindparam("email")).limit(1)
+
+
+def find_user_by_email(email):
+    return db.session.execute(_USER_BY_EMAIL, {"email": email}).scalar_one_or_none()
+
+
+def email_registered(email):
+    return db.session.execute(_EMAIL_TAKEN, {"email": email}).first() is not None
+
+
+class PredictionHistory(db.Model):
+    """One crop recommendation served by /predict."""
+    __tablename__ = 'prediction_history'
+
+    # Autoincrement id doubles as the pagination cursor for /history
+    id = db.Column(db.Integer, primary_key=True)
+    public_id = db.Column(db.String(36), unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    recommendations = db.Column(db.JSON, nullable=False)
+
+    def to_dict(self):
+        return {
+            "id": self.public_id,
+            "timestamp": self.created_at.isoformat(),
+            "recommendations": self.recommendations,
+        }
+
+    def __repr__(self):
+        return f'<PredictionHistory {self.public_id}>'
@@ -0,0 +1,125 @@
+# Flask/app/prefetch.py
+import logging
+import os
+import threading
+import time
+
+from .metrics import PREFETCH_REFRESHES
+
+logger = logging.getLogger(__name__)
+
+# Every PREFETCH_INTERVAL seconds the PREFETCH_TOP_N most requested keys are
+# checked, and those expiring within PREFETCH_LEAD seconds are refreshed, at most
+# PREFETCH_RATE refreshes per second. Request counts decay by PREFETCH_DECAY per
+# round so the hot set follows recent traffic.
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "1") != "0"
+PREFETCH_INTERVAL = float(os.environ.get("PREFETCH_INTERVAL", "30"))
+PREFETCH_LEAD = float(os.environ.get("PREFETCH_LEAD", "90"))
+PREFETCH_TOP_N = int(os.environ.get("PREFETCH_TOP_N", "300"))
+PREFETCH_RATE = float(os.environ.get("PREFETCH_RATE", "5"))
+PREFETCH_DECAY = float(os.environ.get("PREFETCH_DECAY", "0.8"))
+PREFETCH_MAX_TRACKED = int(os.environ.get("PREFETCH_MAX_TRACKED", "5000"))
+
+
+class Prefetcher:
+    """
+    Per-process background refresher for the most requested keys.
+
+    record(key, *args) counts a request; the args are what refresh needs to
+    rebuild the entry. A daemon thread, started on the first record() in each
+    process, calls due(key, lead) for the hottest keys and refresh(key, lead,
+    *args) for the ones that are due. refresh should queue the work on a bounded
+    pool and return whether it did, without waiting for it.
+    """
+
+    def __init__(self, name, refresh, due, top_n=PREFETCH_TOP_N, interval=PREFETCH_INTERVAL,
+                 lead=PREFETCH_LEAD, rate=PREFETCH_RATE, enabled=PREFETCH_ENABLED):
+        self.name = name
+        self.refresh = refresh
+        self.due = due
+        self.top_n = top_n
+        self.interval = interval
+        self.lead = lead
+        self.rate = rate
+        self.enabled = enabled
+        self._counts = {}  # key -> [decayed request count, args]
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.rounds = 0
+        self.refreshes = 0
+
+    def record(self, key, *args):
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is None:
+                if len(self._counts) >= PREFETCH_MAX_TRACKED:
+                    self._prune()
+                entry = self._counts[key] = [0.0, args]
+            entry[0] += 1
+        self._ensure_started()
+
+    def _prune(self):
+        # Drop the coldest half to make room; caller holds the lock
+        keep = sorted(self._counts.items(), key=lambda item: item[1][0], reverse=True)
+        self._counts = dict(keep[:len(keep) // 2])
+
+    def hot_keys(self, n=None):
+        """[(key, count, args)] of the n most requested keys, hottest first."""
+        with self._lock:
+            ranked = sorted(self._counts.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, count, args) for key, (count, args) in ranked[:n or self.top_n]]
+
+    def _ensure_started(self):
+        # Threads do not survive a fork: each worker starts its own scheduler
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-prefetch", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("%s prefetch round failed", self.name)
+
+    def run_once(self):
+        """Refresh the hot keys that are due; returns how many were queued."""
+        queued = 0
+        spacing = 1 / self.rate if self.rate > 0 else 0
+        for key, _, args in self.hot_keys():
+            if not self.due(key, self.lead):
+                continue
+            if self.refresh(key, self.lead, *args):
+                queued += 1
+                PREFETCH_REFRESHES.labels(self.name).inc()
+                time.sleep(spacing)
+
+        with self._lock:
+            for key in list(self._counts):
+                entry = self._counts[key]
+                entry[0] *= PREFETCH_DECAY
+                if entry[0] < 0.05:
+                    del self._counts[key]
+            self.rounds += 1
+            self.refreshes += queued
+        return queued
+
+    def status(self):
+        with self._lock:
+            tracked = len(self._counts)
+        return {
+            "enabled": self.enabled,
+            "running": self._thread is not None and self._pid == os.getpid(),
+            "tracked_keys": tracked,
+            "rounds": self.rounds,
+            "refreshes": self.refreshes,
+            "hot": [{"key": key, "requests": round(count, 2)} for key, count, _ in self.hot_keys(10)],
+        }
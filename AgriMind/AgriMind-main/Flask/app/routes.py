@@ -1,22 +1,24 @@
-from flask import Blueprint, request, jsonify, render_template, Response
+from flask import Blueprint, g, request, jsonify, render_template, Response
 from .storage import dummy_crop_recommendation
-from .models import db, User
+from sqlalchemy.exc import IntegrityError
+
+from .models import db, User, email_registered, find_user_by_email
+from .auth import (
+    AuthBusy, AuthNotConfigured, admin_required, check_password, issue_token, login_required, token_expires_in,
+    tokens_enabled,
+)
 import logging
-import os
 import json
-import requests
+import time
+
+from .llm import (
+    GROQ_API_KEY, LLMError, answer_cache, answer_key, caching_stream, purge_answers,
+    groq_chat, groq_chat_stream, stream_response, use_fake, wants_stream,
+)
 
 main = Blueprint("main", __name__)
 logger = logging.getLogger(__name__)
 
-# =====================================================
-# GROQ CONFIG
-# =====================================================
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL = "llama-3.1-8b-instant"
-
 # =====================================================
 # BASIC ROUTES
 # =====================================================
@@ -26,6 +28,7 @@ def home():
 
 
 @main.route("/dashboard")
+@login_required
 def dashboard():
     return "Welcome to the dashboard!"
 
@@ -56,7 +59,7 @@ def register():
         if not all([name, email, password]):
             return jsonify({"error": "Missing required fields"}), 400
 
-        if User.query.filter_by(email=email).first():
+        if email_registered(email):
             return jsonify({"error": "Email already registered"}), 400
 
         user = User(name=name, email=email)
@@ -67,6 +70,11 @@ def register():
 
         return jsonify({"message": "Registration successful"}), 201
 
+    except IntegrityError:
+        # Lost a race with a concurrent registration of the same email
+        db.session.rollback()
+        return jsonify({"error": "Email already registered"}), 400
+
     except Exception as e:
         db.session.rollback()
         logger.error(e)
@@ -80,33 +88,88 @@ def login():
         email = data.get("email")
         password = data.get("password")
 
-        user = User.query.filter_by(email=email).first()
-        if user and user.check_password(password):
-            return jsonify({"message": "Login successful"}), 200
+        if not tokens_enabled():
+            raise AuthNotConfigured()
+
+        user = find_user_by_email(email)
+        if user and check_password(user, password):
+            return _login_response(user)
 
         return jsonify({"error": "Invalid credentials"}), 401
 
+    except AuthBusy:
+        return jsonify({"error": "Too many login attempts, try again shortly"}), 503, {"Retry-After": "1"}
+
+    except AuthNotConfigured:
+        logger.error("Login refused: set SECRET_KEY to a private random value")
+        return jsonify({"error": "Login is not configured on this server"}), 503
+
     except Exception as e:
         logger.error(e)
         return jsonify({"error": "Login failed"}), 500
 
 
+@main.route("/farmer/refresh", methods=["POST"])
+@login_required
+def refresh():
+    # A new token for a still-valid one. auth_time carries over, so refreshing never
+    # keeps a session alive past SESSION_MAX_AGE after the password was entered.
+    user = User(id=g.user["uid"], email=g.user["email"], name=g.user["name"])
+    return _login_response(user, auth_time=g.user["auth_time"], message="Session refreshed")
+
+
+def _login_response(user, auth_time=None, message="Login successful"):
+    token = issue_token(user, auth_time=auth_time)
+    return jsonify({
+        "message": message,
+        "token": token,
+        "expires_in": token_expires_in(time.time() if auth_time is None else auth_time),
+        "user": {"name": user.name, "email": user.email},
+    }), 200
+
+
 @main.route("/farmer/check-auth", methods=["GET"])
+@login_required
 def check_auth():
-    return jsonify({"status": "ok"}), 200
+    # Signature check only; the users table is not queried
+    return jsonify({"status": "ok", "user": {"name": g.user["name"], "email": g.user["email"]}}), 200
 
 
 @main.route("/farmer/logout", methods=["POST"])
 def logout():
+    # Tokens are stateless: the client drops its token, which then expires on its own
     return jsonify({"message": "Logged out"}), 200
 
 
+# =====================================================
+# 🧹 AGRIBOT ANSWER CACHE (ADMIN)
+# =====================================================
+# Requires ADMIN_TOKEN to be set and sent back in the X-Admin-Token header.
+
+@main.route("/api/agribot/cache", methods=["GET"])
+@admin_required
+def agribot_cache_stats():
+    try:
+        n = int(request.args.get("top", 20))
+    except ValueError:
+        return jsonify({"error": "top must be an integer"}), 400
+    n = max(1, min(n, 1000))
+    top = [{"key": key, "hits": hits} for key, hits in answer_cache.top(n)]
+    return jsonify({"stats": answer_cache.stats(), "top": top}), 200
+
+
+@main.route("/api/agribot/cache", methods=["DELETE"])
+@admin_required
+def agribot_cache_purge():
+    generation = purge_answers()
+    return jsonify({"message": "AgriBot answer cache purged", "generation": generation}), 200
+
+
 # =====================================================
 # 🤖 AGRIBOT (GROQ AI)
 # =====================================================
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL = "llama-3.1-8b-instant"  # ✅ FIXED
+# Groq config lives in app/llm.py. Send {"stream": true} (or Accept: text/event-stream)
+# to get tokens as Server-Sent Events; add ?format=ndjson for NDJSON lines.
 
 @main.route("/api/agribot", methods=["POST"])
 def agribot():
@@ -119,7 +182,7 @@ def agribot():
         if not question:
             return jsonify({"error": "Question required"}), 400
 
-        if not GROQ_API_KEY:
+        if not GROQ_API_KEY and not use_fake():
             return jsonify({"error": "Groq API key not configured"}), 500
 
         system_prompt = (
@@ -132,40 +195,35 @@ def agribot():
         else:
             system_prompt += f" Respond in the same language as the question ({user_lang})."
 
-        payload = {
-            "model": GROQ_MODEL,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": question},
-            ],
-            "temperature": 0.4,
-        }
-
-        r = requests.post(
-            GROQ_URL,
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json=payload,
-            timeout=30,
-        )
+        # Repeat questions are answered from the cache without calling Groq
+        cache_key = answer_key("groq", question, reply_mode, user_lang)
+        cached = answer_cache.get(cache_key)
 
-        if r.status_code != 200:
-            # 🔥 show REAL Groq error
-            return Response(
-                json.dumps({"error": r.text}, ensure_ascii=False),
-                mimetype="application/json; charset=utf-8",
-                status=500,
-            )
+        if wants_stream(data):
+            fmt = request.args.get("format", data.get("format", "sse"))
+            if cached is not None:
+                return stream_response([cached], fmt)
+            tokens = caching_stream(groq_chat_stream(system_prompt, question), cache_key)
+            return stream_response(tokens, fmt)
 
-        answer = r.json()["choices"][0]["message"]["content"]
+        if cached is not None:
+            answer = cached
+        else:
+            answer = groq_chat(system_prompt, question)
+            answer_cache.set(cache_key, answer)
 
         return Response(
             json.dumps({"answer": answer}, ensure_ascii=False),
             mimetype="application/json; charset=utf-8",
         )
 
+    except LLMError as e:
+        # 🔥 show REAL Groq error
+        return Response(
+            json.dumps({"error": e.details}, ensure_ascii=False),
+            mimetype="application/json; charset=utf-8",
+            status=500,
+        )
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
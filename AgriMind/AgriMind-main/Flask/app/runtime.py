@@ -0,0 +1,40 @@
+# Flask/app/runtime.py
+import os
+import resource
+
+# Startup phases of this process in milliseconds (import, create_app, schema,
+# model warm-up), reported at /api/system/startup
+startup_timings = {}
+
+# Fields of /proc/<pid>/smaps_rollup worth reporting, in kB
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def memory_footprint(pid=None):
+    """
+    Memory footprint of one process, in kB.
+
+    On Linux this reads smaps_rollup: Rss counts shared pages (memory-mapped model
+    arrays, copy-on-write pages from a preloaded master) in every worker, while Pss
+    divides them among the processes sharing them, so summing Pss over all
+    gunicorn workers gives their real combined footprint.
+    """
+    pid = pid or os.getpid()
+    footprint = {"pid": pid}
+
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in SMAPS_FIELDS:
+                    footprint[key.lower() + "_kb"] = int(rest.split()[0])
+    except OSError:
+        # Not Linux (or no procfs): peak RSS of this process is the best we have
+        if pid == os.getpid():
+            footprint["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return footprint
+
+
+def format_footprint(footprint):
+    return " ".join(f"{key}={value}" for key, value in footprint.items())
@@ -2,55 +2,168 @@
 
 import requests
 import json
+import logging
+import math
 import os # Needed for environment variables (if we were using SoilGrids with a key)
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dataclasses import dataclass
+from typing import Optional
+
+from .http_client import get_session
+from .cache import CACHE_DIR, LRUCache, SQLiteCache, TieredCache, register
+from .metrics import track_upstream
+from .singleflight import SingleFlight
+from .circuit import OPEN, CircuitBreaker, is_upstream_failure
+from .prefetch import Prefetcher
+
+logger = logging.getLogger(__name__)
 
 # --- API Endpoints ---
-OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+# Both can be pointed elsewhere (e.g. the fake upstreams in loadtest/) through the environment
+OPEN_METEO_URL = os.environ.get("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
 # SoilGrids REST API v2.0 endpoint for property queries
-SOILGRIDS_URL = "https://rest.isric.org/soilgrids/v2.0/properties/query"
+SOILGRIDS_URL = os.environ.get("SOILGRIDS_URL", "https://rest.isric.org/soilgrids/v2.0/properties/query")
+
 
+# --- SoilGrids Cache ---
+# SoilGrids is a static 250 m raster, so every point inside one cell gets the same
+# answer. Coordinates are snapped to a 250 m grid and results are kept in a
+# persistent SQLite file (shared by workers, kept across restarts) behind an
+# in-process LRU. SOIL_CACHE_TTL (seconds) is unset by default: entries never expire.
+# The file is opened on first lookup; if it cannot be, only the LRU is used.
+SOIL_CELL_METERS = 250.0
+METERS_PER_DEGREE_LAT = 111_320.0
 
-# --- SoilGrids Helper Function ---
+soil_cache = register(TieredCache(
+    "soilgrids",
+    LRUCache("soilgrids", maxsize=int(os.environ.get("SOIL_CACHE_MEMORY_SIZE", "4096"))),
+    SQLiteCache(
+        "soilgrids",
+        os.environ.get("SOIL_CACHE_PATH", os.path.join(CACHE_DIR, "soilgrids_cache.sqlite")),
+        ttl=float(os.environ["SOIL_CACHE_TTL"]) if os.environ.get("SOIL_CACHE_TTL") else None,
+    ),
+))
 
-def _fetch_single_soil_property(latitude: float, longitude: float, property_name: str, depth_interval: str = '0-5cm'):
+
+def snap_to_soil_cell(latitude: float, longitude: float):
     """
-    Fetches a single soil property (e.g., phh2o, nitrogen) at a specific depth and returns the mean prediction.
+    Snap a coordinate to the centre of its ~250 m grid cell.
+
+    Returns (cell_id, cell_lat, cell_lon). The longitude step widens with latitude
+    so cells stay ~250 m wide on the ground.
+    """
+    lat_step = SOIL_CELL_METERS / METERS_PER_DEGREE_LAT
+    lat_index = math.floor(latitude / lat_step)
+    cell_lat = (lat_index + 0.5) * lat_step
+
+    lon_step = lat_step / max(math.cos(math.radians(cell_lat)), 1e-6)
+    lon_index = math.floor(longitude / lon_step)
+    cell_lon = (lon_index + 0.5) * lon_step
+
+    return f"{lat_index}:{lon_index}", round(cell_lat, 6), round(cell_lon, 6)
+
+
+# --- SoilGrids Helper Functions ---
+
+SOILGRIDS_TIMEOUT = float(os.environ.get("SOILGRIDS_TIMEOUT", "10"))
+
+# Properties fetched for /api/soil. Adding one (e.g. soc, cec, clay) rides on the same
+# request instead of adding another round trip.
+SOIL_PROPERTIES = ("phh2o", "nitrogen")
+SOIL_DEPTHS = ("0-5cm",)
+
+# Cached cells (the last known good values) are served before the breaker is consulted
+soilgrids_breaker = CircuitBreaker("soilgrids")
+
+
+@dataclass
+class SoilProperty:
+    """Mean prediction of one SoilGrids property at one depth."""
+    name: str
+    depth: str
+    raw: Optional[float]          # as stored by SoilGrids, in mapped units (e.g. pH * 10)
+    d_factor: float = 1.0         # raw / d_factor gives target units
+    mapped_units: str = ""
+    target_units: str = ""
+
+    @property
+    def value(self) -> Optional[float]:
+        """Value in target units (e.g. phh2o 65 -> pH 6.5)."""
+        return self.raw / self.d_factor if self.raw is not None else None
+
+
+def fetch_soil_properties(latitude: float, longitude: float, properties=SOIL_PROPERTIES,
+                          depths=SOIL_DEPTHS, timeout: float = SOILGRIDS_TIMEOUT):
+    """
+    Fetches several soil properties at several depths in one SoilGrids query.
+
+    Returns {property_name: {depth_label: SoilProperty}}; empty if the request failed.
     """
     params = {
         "lon": longitude,
         "lat": latitude,
-        "property": [property_name],
-        "depth": [depth_interval],
+        "property": list(properties),
+        "depth": list(depths),
         # Mean (Q0.50) is the most common prediction to use
-        "value": ["mean"], 
+        "value": ["mean"],
         "spatialres": "250m" # Resolution
     }
-    
-    try:
-        response = requests.get(SOILGRIDS_URL, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Parse the JSON structure to get the value
-        # Data is stored as an array of properties -> depth -> values
-        layers = data.get('properties', {}).get('layers', [])
-        if layers:
-            mean_value_raw = layers[0].get('depths', [{}])[0].get('values', {}).get('mean')
-            
-            if property_name == 'phh2o':
-                # SoilGrids stores pH * 10 (e.g., pH 6.5 is stored as 65). We divide by 10.
-                return mean_value_raw / 10 if mean_value_raw is not None else None
-            elif property_name == 'nitrogen':
-                # Nitrogen is stored in cg/kg * 100. Let's return the raw value for now.
-                return mean_value_raw
-            else:
-                return mean_value_raw
-        
-        return None
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching SoilGrids property {property_name}: {e}")
+    with soilgrids_breaker.attempt() as allowed:
+        # While the circuit is open, fail at once so callers fall back without waiting
+        if not allowed:
+            return {}
+
+        try:
+            with track_upstream("soilgrids") as call:
+                response = get_session().get(SOILGRIDS_URL, params=params, timeout=timeout)
+                call.status = response.status_code
+                response.raise_for_status()
+                data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if is_upstream_failure(e):
+                soilgrids_breaker.record_failure()
+            print(f"Error fetching SoilGrids properties {', '.join(properties)}: {e}")
+            return {}
+        soilgrids_breaker.record_success()
+
+    # Data is stored as an array of properties -> depth -> values
+    results = {}
+    for layer in data.get('properties', {}).get('layers', []):
+        units = layer.get('unit_measure', {})
+        by_depth = {}
+        for depth in layer.get('depths', []):
+            label = depth.get('label')
+            by_depth[label] = SoilProperty(
+                name=layer.get('name'),
+                depth=label,
+                raw=depth.get('values', {}).get('mean'),
+                d_factor=units.get('d_factor') or 1.0,
+                mapped_units=units.get('mapped_units', ""),
+                target_units=units.get('target_units', ""),
+            )
+        results[layer.get('name')] = by_depth
+    return results
+
+
+def _soil_value(prop: Optional[SoilProperty]):
+    if prop is None or prop.raw is None:
         return None
+    if prop.name == 'phh2o':
+        # SoilGrids stores pH * 10 (e.g., pH 6.5 is stored as 65). We divide by 10.
+        return prop.raw / 10
+    # Nitrogen is stored in cg/kg * 100. Let's return the raw value for now.
+    return prop.raw
+
+
+# --- Request Coalescing ---
+# Dashboards for one cooperative ask for the same cell/bucket many times a second.
+# Concurrent cache misses for one key share a single upstream call per worker.
+soil_flights = SingleFlight("soilgrids")
+weather_flights = SingleFlight("openmeteo")
 
 
 # --- Main Soil Data Fetcher ---
@@ -58,13 +171,31 @@ def _fetch_single_soil_property(latitude: float, longitude: float, property_name
 def fetch_soil_data(latitude: float, longitude: float):
     """
     Fetches all required soil properties (N, P, K, pH) using SoilGrids and mocks missing data.
+    Repeat lookups inside the same 250 m cell are served from the soil cache.
     """
-    
+    cell_id, cell_lat, cell_lon = snap_to_soil_cell(latitude, longitude)
+    cache_key = f"soil:{cell_id}"
+
+    cached = soil_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    flight_key = f"{cache_key}:{','.join(SOIL_PROPERTIES)}:{','.join(SOIL_DEPTHS)}"
+    return soil_flights.do(flight_key, _fetch_soil_cell, cache_key, cell_lat, cell_lon)
+
+
+def _fetch_soil_cell(cache_key, cell_lat, cell_lon):
+    # A flight that just finished may have filled the cache
+    cached = soil_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     # 1. Fetch data from SoilGrids (N and pH are directly available)
     
-    # pH (phh2o) and Nitrogen (nitrogen) at 0-5cm depth
-    soil_ph = _fetch_single_soil_property(latitude, longitude, 'phh2o', '0-5cm')
-    soil_nitrogen = _fetch_single_soil_property(latitude, longitude, 'nitrogen', '0-5cm')
+    # pH (phh2o) and Nitrogen (nitrogen) at 0-5cm depth, for the cell centre, in one request
+    soil = fetch_soil_properties(cell_lat, cell_lon, SOIL_PROPERTIES, SOIL_DEPTHS)
+    soil_ph = _soil_value(soil.get('phh2o', {}).get('0-5cm'))
+    soil_nitrogen = _soil_value(soil.get('nitrogen', {}).get('0-5cm'))
     
     # 2. Mock missing data (P and K are usually obtained via lab tests or statistical models)
     # Since SoilGrids doesn't provide them, we mock them for the ML model input.
@@ -79,71 +210,276 @@ def fetch_soil_data(latitude: float, longitude: float):
             "P": MOCK_PHOSPHORUS,
             "K": MOCK_POTASSIUM,
             "pH": 6.5, # Mock pH value
-            "source": "MOCK_FALLBACK"
+            "source": "MOCK_FALLBACK",
+            "circuit": soilgrids_breaker.state
         }
         
-    # 4. Return the combined real/mock data
-    return {
+    # 4. Return the combined real/mock data (only real lookups are cached)
+    soil_data = {
         "N": soil_nitrogen,
         "P": MOCK_PHOSPHORUS,
         "K": MOCK_POTASSIUM,
         "pH": soil_ph,
         "source": "SOILGRIDS"
     }
+    soil_cache.set(cache_key, soil_data)
+    return soil_data
+
+
+# --- Weather Cache ---
+# Traffic clusters around a few hundred villages, so coordinates are bucketed to a
+# WEATHER_GRID_DEG grid (0.05 deg ~ 5 km) and cached per bucket. Current conditions
+# and the daily forecast are cached separately, with TTLs matching how often
+# Open-Meteo refreshes them: minutes for `current`, hours for `forecast_5day`.
+# Entries are kept WEATHER_STALE_TTL seconds past their TTL: a stale entry is
+# served at once while a background refresh fetches a new one.
+WEATHER_GRID_DEG = float(os.environ.get("WEATHER_GRID_DEG", "0.05"))
+WEATHER_TIMEOUT = float(os.environ.get("WEATHER_TIMEOUT", "10"))
+WEATHER_CACHE_SIZE = int(os.environ.get("WEATHER_CACHE_SIZE", "4096"))
+WEATHER_CURRENT_TTL = float(os.environ.get("WEATHER_CURRENT_TTL", "600"))
+WEATHER_FORECAST_TTL = float(os.environ.get("WEATHER_FORECAST_TTL", "10800"))
+WEATHER_STALE_TTL = float(os.environ.get("WEATHER_STALE_TTL", "21600"))
+WEATHER_REFRESH_WORKERS = int(os.environ.get("WEATHER_REFRESH_WORKERS", "2"))
+
+# Entries are {"data": section, "fetched_at": unix time}
+weather_current_cache = register(LRUCache(
+    "weather_current",
+    maxsize=WEATHER_CACHE_SIZE,
+    ttl=WEATHER_CURRENT_TTL + WEATHER_STALE_TTL,
+))
+weather_forecast_cache = register(LRUCache(
+    "weather_forecast",
+    maxsize=WEATHER_CACHE_SIZE,
+    ttl=WEATHER_FORECAST_TTL + WEATHER_STALE_TTL,
+))
+
+# Response section -> (cache, seconds an entry counts as fresh)
+WEATHER_SECTIONS = {
+    "current": (weather_current_cache, WEATHER_CURRENT_TTL),
+    "forecast_5day": (weather_forecast_cache, WEATHER_FORECAST_TTL),
+}
+
+WEATHER_CURRENT_FIELDS = ["temperature_2m", "relative_humidity_2m", "precipitation", "wind_speed_10m"]
+WEATHER_DAILY_FIELDS = ["temperature_2m_max", "temperature_2m_min", "precipitation_sum", "wind_speed_10m_max"]
+
+# Served (per missing section) when Open-Meteo cannot be reached
+WEATHER_FALLBACK = {
+    "current": {
+        "Temperature": 25.0,
+        "Humidity": 75.0,
+        "Rainfall": 50.0,
+        "WindSpeed": 10.0
+    },
+    "forecast_5day": {
+        "Time": ["2025-10-04", "2025-10-05", "2025-10-06", "2025-10-07", "2025-10-08"],
+        "Temp_Max": [30.0, 31.0, 29.5, 30.5, 31.5],
+        "Temp_Min": [18.0, 19.0, 17.5, 18.5, 19.5],
+        "Rainfall_Sum": [10.0, 5.0, 0.0, 2.0, 8.0],
+        "WindSpeed_Max": [15.0, 18.0, 12.0, 14.0, 16.0]
+    }
+}
+
+openmeteo_breaker = CircuitBreaker("openmeteo")
+
+
+def snap_to_weather_grid(latitude: float, longitude: float):
+    """Round a coordinate to the weather grid; returns (bucket_key, lat, lon)."""
+    grid = WEATHER_GRID_DEG
+    lat = round(round(latitude / grid) * grid, 6)
+    lon = round(round(longitude / grid) * grid, 6)
+    return f"{lat}:{lon}", lat, lon
+
+
+def _weather_entries(bucket_key, peek=False):
+    # peek: background checks and re-reads, kept out of the cache hit-rate stats
+    return {
+        section: cache.peek(bucket_key) if peek else cache.get(bucket_key)
+        for section, (cache, _) in WEATHER_SECTIONS.items()
+    }
+
 
+def _is_fresh(section, entry, now):
+    return entry is not None and now - entry["fetched_at"] < WEATHER_SECTIONS[section][1]
+
+
+def _weather_response(entries):
+    """Sections from cache entries (or the fallback), plus how fresh each one is."""
+    now = time.time()
+    response = {}
+    freshness = {"circuit": openmeteo_breaker.state}
+    for section, entry in entries.items():
+        if entry is None:
+            response[section] = WEATHER_FALLBACK[section]
+            freshness[section] = {"source": "fallback", "stale": True, "age_seconds": None}
+        else:
+            response[section] = entry["data"]
+            freshness[section] = {
+                "source": "open-meteo",
+                "stale": not _is_fresh(section, entry, now),
+                "age_seconds": round(now - entry["fetched_at"], 1),
+            }
+    response["freshness"] = freshness
+    return response
 
-# --- Existing Weather Data Fetcher (Included for completeness) ---
+
+# --- Weather Data Fetcher ---
 
 def fetch_weather_data(latitude: float, longitude: float):
-    # This is the weather function from the previous step, ensuring the file remains whole.
+    """
+    Current conditions and a 5-day forecast from Open-Meteo for the grid bucket
+    around (latitude, longitude). Only the sections missing from the cache are
+    requested upstream; stale sections are served as they are and refreshed in
+    the background. `freshness` reports the age and source of each section.
+    """
+    bucket_key, bucket_lat, bucket_lon = snap_to_weather_grid(latitude, longitude)
+    weather_prefetcher.record(bucket_key, bucket_lat, bucket_lon)
+    entries = _weather_entries(bucket_key)
+    now = time.time()
+
+    if all(_is_fresh(section, entry, now) for section, entry in entries.items()):
+        return _weather_response(entries)
+
+    if all(entry is not None for entry in entries.values()):
+        schedule_weather_refresh(bucket_key, bucket_lat, bucket_lon)
+        return _weather_response(entries)
+
+    return weather_flights.do(bucket_key, _fetch_weather_bucket, bucket_key, bucket_lat, bucket_lon)
+
+
+def _fetch_weather_bucket(bucket_key, bucket_lat, bucket_lon, lead=0):
+    """
+    Fetch the sections of one bucket that are missing, stale or (with `lead`)
+    expiring within `lead` seconds; on failure serve what the cache has.
+    """
+    # Re-read: a flight that just finished may have filled them
+    entries = _weather_entries(bucket_key, peek=True)
+    now = time.time()
+    needed = [section for section, entry in entries.items() if not _is_fresh(section, entry, now + lead)]
+    if not needed:
+        return _weather_response(entries)
+
     params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "current": ["temperature_2m", "relative_humidity_2m", "precipitation", "wind_speed_10m"],
-        "daily": ["temperature_2m_max", "temperature_2m_min", "precipitation_sum", "wind_speed_10m_max"],
-        "forecast_days": 5, 
-        "timezone": "auto" 
+        "latitude": bucket_lat,
+        "longitude": bucket_lon,
+        "timezone": "auto"
     }
-    
-    try:
-        response = requests.get(OPEN_METEO_URL, params=params)
-        response.raise_for_status() 
-        
-        data = response.json()
+    if "current" in needed:
+        params["current"] = WEATHER_CURRENT_FIELDS
+    if "forecast_5day" in needed:
+        params["daily"] = WEATHER_DAILY_FIELDS
+        params["forecast_days"] = 5
+
+    data = _request_open_meteo(params)
+    if data is None:
+        return _weather_response(entries)
+    fetched_at = time.time()
+
+    if "current" in needed:
         current = data.get('current', {})
+        entries["current"] = {"fetched_at": fetched_at, "data": {
+            "Temperature": current.get('temperature_2m'),
+            "Humidity": current.get('relative_humidity_2m'),
+            "Rainfall": current.get('precipitation'),
+            "WindSpeed": current.get('wind_speed_10m')
+        }}
+        weather_current_cache.set(bucket_key, entries["current"])
+
+    if "forecast_5day" in needed:
         daily = data.get('daily', {})
-        
-        weather_output = {
-            "current": {
-                "Temperature": current.get('temperature_2m'), 
-                "Humidity": current.get('relative_humidity_2m'), 
-                "Rainfall": current.get('precipitation'), 
-                "WindSpeed": current.get('wind_speed_10m')
-            },
-            "forecast_5day": {
-                "Time": daily.get('time', []),
-                "Temp_Max": daily.get('temperature_2m_max', []),
-                "Temp_Min": daily.get('temperature_2m_min', []),
-                "Rainfall_Sum": daily.get('precipitation_sum', []),
-                "WindSpeed_Max": daily.get('wind_speed_10m_max', [])
-            }
-        }
-        return weather_output
-
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching weather data from Open-Meteo: {e}")
-        return {
-            "current": {
-                "Temperature": 25.0,
-                "Humidity": 75.0,
-                "Rainfall": 50.0,
-                "WindSpeed": 10.0
-            },
-            "forecast_5day": {
-                "Time": ["2025-10-04", "2025-10-05", "2025-10-06", "2025-10-07", "2025-10-08"],
-                "Temp_Max": [30.0, 31.0, 29.5, 30.5, 31.5],
-                "Temp_Min": [18.0, 19.0, 17.5, 18.5, 19.5],
-                "Rainfall_Sum": [10.0, 5.0, 0.0, 2.0, 8.0],
-                "WindSpeed_Max": [15.0, 18.0, 12.0, 14.0, 16.0]
-            }
-        }
+        entries["forecast_5day"] = {"fetched_at": fetched_at, "data": {
+            "Time": daily.get('time', []),
+            "Temp_Max": daily.get('temperature_2m_max', []),
+            "Temp_Min": daily.get('temperature_2m_min', []),
+            "Rainfall_Sum": daily.get('precipitation_sum', []),
+            "WindSpeed_Max": daily.get('wind_speed_10m_max', [])
+        }}
+        weather_forecast_cache.set(bucket_key, entries["forecast_5day"])
+
+    return _weather_response(entries)
+
+
+def _request_open_meteo(params):
+    """Open-Meteo's JSON answer, or None if the call failed or the circuit is open."""
+    with openmeteo_breaker.attempt() as allowed:
+        # While the circuit is open, answer from cache or fallback without waiting on Open-Meteo
+        if not allowed:
+            return None
+
+        try:
+            with track_upstream("openmeteo") as call:
+                response = get_session().get(OPEN_METEO_URL, params=params, timeout=WEATHER_TIMEOUT)
+                call.status = response.status_code
+                response.raise_for_status()
+                data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            if is_upstream_failure(e):
+                openmeteo_breaker.record_failure()
+            print(f"Error fetching weather data from Open-Meteo: {e}")
+            return None
+        openmeteo_breaker.record_success()
+        return data
+
+
+# --- Background Weather Refresh ---
+
+_refresh_executor = None
+_refresh_pid = None
+_refresh_lock = threading.Lock()
+_refreshing = set()
+
+
+def _get_refresh_executor():
+    # Threads do not survive a fork: each worker builds its own bounded pool
+    global _refresh_executor, _refresh_pid
+    if _refresh_executor is None or _refresh_pid != os.getpid():
+        with _refresh_lock:
+            if _refresh_executor is None or _refresh_pid != os.getpid():
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=WEATHER_REFRESH_WORKERS, thread_name_prefix="weather-refresh"
+                )
+                _refresh_pid = os.getpid()
+                _refreshing.clear()
+    return _refresh_executor
+
+
+def schedule_weather_refresh(bucket_key, bucket_lat, bucket_lon, lead=0):
+    """Queue a background refresh of one bucket; returns False if one is already queued."""
+    executor = _get_refresh_executor()
+    with _refresh_lock:
+        if bucket_key in _refreshing:
+            return False
+        _refreshing.add(bucket_key)
+    executor.submit(_refresh_weather, bucket_key, bucket_lat, bucket_lon, lead)
+    return True
+
+
+def _refresh_weather(bucket_key, bucket_lat, bucket_lon, lead=0):
+    try:
+        weather_flights.do(bucket_key, _fetch_weather_bucket, bucket_key, bucket_lat, bucket_lon, lead)
+    except Exception:
+        logger.exception("Background weather refresh for %s failed", bucket_key)
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(bucket_key)
+
+
+# --- Weather Prefetch ---
+# Popular buckets are refreshed shortly before their sections expire, on the
+# refresh pool above, so requests for them keep hitting fresh cache entries.
+# Counts and caches are per worker process, like the weather caches themselves.
+
+def weather_refresh_due(bucket_key, lead):
+    """True if a section of the bucket is missing or expires within `lead` seconds."""
+    # Leave an open circuit alone; requests are being answered from cache meanwhile
+    if openmeteo_breaker.state == OPEN:
+        return False
+    horizon = time.time() + lead
+    entries = _weather_entries(bucket_key, peek=True)
+    return not all(_is_fresh(section, entry, horizon) for section, entry in entries.items())
+
+
+def _prefetch_weather(bucket_key, lead, bucket_lat, bucket_lon):
+    return schedule_weather_refresh(bucket_key, bucket_lat, bucket_lon, lead=lead)
+
+
+weather_prefetcher = Prefetcher("weather", refresh=_prefetch_weather, due=weather_refresh_due)
@@ -0,0 +1,147 @@
+# Flask/benchmarks/bench_db.py
+#
+# Concurrent register/login traffic against the database backends, through the
+# real /farmer routes (password hashing included) plus the bare user lookup.
+#
+#   cd Flask
+#   python -m benchmarks.bench_db --users 200 --concurrency 16
+#   python -m benchmarks.bench_db --postgres-url postgresql://user:pw@localhost/agrimind_bench
+#
+# Backends: sqlite-wal (the default engine settings), sqlite-rollback (the old
+# rollback-journal behaviour, for comparison) and postgres (when a URL is given).
+# Each one runs in a fresh interpreter so its engine settings come from the env.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+FLASK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FLASK_DIR not in sys.path:
+    sys.path.insert(0, FLASK_DIR)
+
+LOOKUPS_PER_USER = 10
+
+
+def _summary(samples, errors, elapsed):
+    ms = np.asarray(samples) * 1000
+    return {
+        "ops": len(samples),
+        "errors": errors,
+        "ops_per_s": round(len(samples) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+def _phase(fn, items, concurrency):
+    """Run fn over items on `concurrency` threads; fn returns True on success."""
+    def timed(item):
+        start = time.perf_counter()
+        ok = fn(item)
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, items))
+    elapsed = time.perf_counter() - started
+    return _summary([r[0] for r in results], sum(not r[1] for r in results), elapsed)
+
+
+def run_backend(users, concurrency):
+    """Runs inside the per-backend interpreter; DATABASE_URL etc. come from the env."""
+    from app import create_app
+    from app.database import create_schema
+    from app.models import find_user_by_email
+
+    app = create_app()
+    create_schema(app)
+    run_id = uuid.uuid4().hex[:8]
+    emails = [f"bench-{run_id}-{i}@agrimind.test" for i in range(users)]
+
+    def register(email):
+        r = app.test_client().post("/farmer/register", json={"name": "Bench", "email": email, "password": "pw-" + email})
+        return r.status_code == 201
+
+    def login(email):
+        r = app.test_client().post("/farmer/login", json={"email": email, "password": "pw-" + email})
+        return r.status_code == 200
+
+    def lookup(email):
+        with app.app_context():
+            return find_user_by_email(email) is not None
+
+    return {
+        "register": _phase(register, emails, concurrency),
+        "login": _phase(login, emails, concurrency),
+        "lookup": _phase(lookup, emails * LOOKUPS_PER_USER, concurrency),
+    }
+
+
+def backends(args, workdir):
+    configs = {
+        "sqlite-wal": {"DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'wal.db')}"},
+        "sqlite-rollback": {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'rollback.db')}",
+            "SQLITE_JOURNAL_MODE": "DELETE",
+            "SQLITE_SYNCHRONOUS": "FULL",
+        },
+    }
+    if args.postgres_url:
+        configs["postgres"] = {"DATABASE_URL": args.postgres_url}
+    return configs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AgriMind database benchmark")
+    parser.add_argument("--users", type=int, default=200, help="accounts registered and logged in per backend")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--postgres-url", default=os.environ.get("BENCH_POSTGRES_URL"),
+                        help="also benchmark this PostgreSQL database (tables are created if missing)")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--run-backend", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_backend:
+        print(json.dumps(run_backend(args.users, args.concurrency)))
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="agrimind-bench-db-") as workdir:
+        for name, env in backends(args, workdir).items():
+            out = subprocess.run(
+                [sys.executable, "-W", "ignore", "-m", "benchmarks.bench_db", "--run-backend",
+                 "--users", str(args.users), "--concurrency", str(args.concurrency)],
+                cwd=FLASK_DIR,
+                env={**os.environ, **env, "CACHE_DIR": workdir,
+                     # Login is refused without a signing key
+                     "SECRET_KEY": os.environ.get("SECRET_KEY") or uuid.uuid4().hex},
+                capture_output=True, text=True,
+            )
+            if out.returncode != 0:
+                print(f"{name}: failed\n{out.stderr[-2000:]}")
+                continue
+            results[name] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"\n{'backend':16s} {'op':9s} {'ops':>6s} {'errors':>7s} {'ops/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for name, ops in results.items():
+        for op, r in ops.items():
+            print(f"{name:16s} {op:9s} {r['ops']:6d} {r['errors']:7d} {r['ops_per_s']:8.1f} "
+                  f"{r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"users": args.users, "concurrency": args.concurrency, "results": results}, f, indent=2)
+        print(f"Results saved at {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
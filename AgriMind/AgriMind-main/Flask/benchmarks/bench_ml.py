@@ -0,0 +1,235 @@
+# Flask/benchmarks/bench_ml.py
+#
+# Offline micro-benchmarks for the ML hot paths. Inputs come from the shipped CSVs
+# and the trained artifacts; no network is used.
+#
+#   cd Flask
+#   python -m benchmarks.bench_ml --out bench.json
+#   python -m benchmarks.bench_ml --compare bench.json      # exits 1 on a regression
+#
+# AGRIMIND_INFERENCE_ENGINE / AGRIMIND_MODEL_MMAP apply as they do in the app.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+FLASK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FLASK_DIR not in sys.path:
+    sys.path.insert(0, FLASK_DIR)
+
+from ml.crop_recommender import model_training as crop_training
+from ml.yield_predictor.yield_predict import NUMERIC_FEATURES
+
+BATCH_SIZES = (1, 8, 64, 512, 2048)
+YIELD_CROP_COUNTS = (1, 3, 10)
+
+# Code run in a fresh interpreter; prints one JSON line of measurements
+_COLD_LOAD = """
+import json, resource, time
+t0 = time.perf_counter()
+from ml.crop_recommender import predict
+t1 = time.perf_counter()
+from ml.yield_predictor.yield_predict import get_predictor
+get_predictor()
+t2 = time.perf_counter()
+predict.predict_top_crops_batch([[90, 42, 43, 20.9, 82.0, 6.5, 202.9]])
+get_predictor().predict([100, 50, 50, 27, 85, 6.5, 180, 40, 7, 5], ["rice"])
+print(json.dumps({
+    "crop_s": t1 - t0,
+    "yield_s": t2 - t1,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+_APP_IMPORT = """
+import json, os, resource, time
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app()
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "create_app_s": t2 - t1,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def _run_fresh(code):
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        cwd=FLASK_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _timings(fn, repeats):
+    samples = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - start
+    return samples * 1000  # ms
+
+
+def _percentiles(prefix, samples_ms, metrics):
+    metrics[f"{prefix}.p50_ms"] = round(float(np.percentile(samples_ms, 50)), 4)
+    metrics[f"{prefix}.p99_ms"] = round(float(np.percentile(samples_ms, 99)), 4)
+
+
+def crop_rows():
+    df = pd.read_csv(crop_training.ORIGINAL_CSV_PATH)
+    return df[crop_training.FEATURES].to_numpy(dtype=np.float64)
+
+
+def yield_rows():
+    from ml.yield_predictor import yield_model_training as yield_training
+    df = pd.read_csv(yield_training.CSV_PATH)
+    return df[NUMERIC_FEATURES].to_numpy(dtype=np.float64), df["label"].str.lower().unique().tolist()
+
+
+def bench_cold(metrics, runs):
+    cold = [_run_fresh(_COLD_LOAD) for _ in range(runs)]
+    metrics["load.cold.crop_ms"] = round(min(r["crop_s"] for r in cold) * 1000, 2)
+    metrics["load.cold.yield_ms"] = round(min(r["yield_s"] for r in cold) * 1000, 2)
+    metrics["memory.models_peak_rss_mb"] = round(max(r["peak_rss_mb"] for r in cold), 1)
+
+    startup = [_run_fresh(_APP_IMPORT) for _ in range(runs)]
+    metrics["startup.import_app_ms"] = round(min(r["import_s"] for r in startup) * 1000, 2)
+    metrics["startup.create_app_ms"] = round(min(r["create_app_s"] for r in startup) * 1000, 2)
+    metrics["memory.app_peak_rss_mb"] = round(max(r["peak_rss_mb"] for r in startup), 1)
+
+
+def bench_warm(metrics, repeats):
+    from ml.crop_recommender import predict
+    from ml.yield_predictor.yield_predict import YieldPredictor
+
+    # Artifacts already in the page cache; measures deserialization alone
+    predict._load()
+    YieldPredictor.load()
+    _percentiles("load.warm.crop", _timings(predict._load, repeats), metrics)
+    _percentiles("load.warm.yield", _timings(YieldPredictor.load, repeats), metrics)
+
+    tracemalloc.start()
+    predict._load()
+    YieldPredictor.load()
+    metrics["memory.load_traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+    tracemalloc.stop()
+
+
+def bench_crop(metrics, repeats):
+    from ml.crop_recommender.predict import predict_top_crops_batch, predict_top_crops_from_features
+
+    X = crop_rows()
+    rng = np.random.default_rng(0)
+    singles = X[rng.integers(0, len(X), repeats)]
+    it = iter(singles)
+    _percentiles("crop.single_row", _timings(lambda: predict_top_crops_from_features([next(it)]), repeats), metrics)
+
+    for size in BATCH_SIZES:
+        batch = X[rng.integers(0, len(X), size)]
+        rounds = max(5, repeats // size)
+        samples = _timings(lambda: predict_top_crops_batch(batch), rounds)
+        metrics[f"crop.batch_{size}.p50_ms"] = round(float(np.percentile(samples, 50)), 4)
+        metrics[f"crop.batch_{size}.rows_per_s"] = round(size / (float(np.median(samples)) / 1000), 1)
+
+
+def bench_yield(metrics, repeats):
+    from ml.yield_predictor.yield_predict import predict_yield_for_crops
+
+    X, crops = yield_rows()
+    rng = np.random.default_rng(0)
+    for count in YIELD_CROP_COUNTS:
+        chosen = crops[:count]
+        rows = iter(X[rng.integers(0, len(X), repeats)])
+        samples = _timings(lambda: predict_yield_for_crops(next(rows).tolist(), chosen), repeats)
+        _percentiles(f"yield.crops_{count}", samples, metrics)
+        metrics[f"yield.crops_{count}.rows_per_s"] = round(count / (float(np.median(samples)) / 1000), 1)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=FLASK_DIR, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(repeats=300, cold_runs=3):
+    import sklearn
+
+    metrics = {}
+    bench_cold(metrics, cold_runs)
+    bench_warm(metrics, max(3, repeats // 100))
+    bench_crop(metrics, repeats)
+    bench_yield(metrics, repeats)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "engine": os.environ.get("AGRIMIND_INFERENCE_ENGINE", "sklearn"),
+            "cpu_count": os.cpu_count(),
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Metrics worse than the baseline by more than `tolerance` (a fraction)."""
+    regressions = []
+    for name, value in current["metrics"].items():
+        base = baseline["metrics"].get(name)
+        if not base:
+            continue
+        # Throughputs should go up; times and memory should go down
+        change = (base - value) / base if name.endswith("_per_s") else (value - base) / base
+        if change > tolerance:
+            regressions.append((name, base, value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AgriMind ML micro-benchmarks")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument("--repeats", type=int, default=300)
+    parser.add_argument("--cold-runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = run(args.repeats, args.cold_runs)
+    for name, value in results["metrics"].items():
+        print(f"{name:40s} {value}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved at {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, base, value, change in regressions:
+            print(f"REGRESSION {name}: {base} -> {value} ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare} (baseline commit {baseline['meta'].get('commit')})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
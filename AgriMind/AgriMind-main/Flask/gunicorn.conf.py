@@ -0,0 +1,91 @@
+# Flask/gunicorn.conf.py
+#
+# Usage (from the Flask directory):
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# Tables are created and both models loaded once in the master (when_ready)
+# before forking, so a new or restarted worker only has to fork. With
+# AGRIMIND_INFERENCE_ENGINE=compiled and the exported *.forest.joblib artifacts
+# (python -m ml.compiled_forest export), the model arrays are memory-mapped
+# read-only, so every worker shares the same physical pages.
+
+import glob
+import logging
+import os
+import time
+import tempfile
+
+# Metrics from all workers are merged through files in this directory (see
+# app/metrics.py). It must be set before the app is imported. On every start the
+# *.db sample files of an earlier run are removed, so dead workers are not
+# reported, but only from a directory this config created itself (it holds the
+# marker file below); nothing else is ever deleted.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "agrimind-prometheus")
+)
+MULTIPROC_MARKER = ".agrimind-prometheus"
+
+
+def prepare_multiproc_dir(path):
+    real = os.path.realpath(path)
+    protected = {os.path.realpath(p) for p in ("/", os.path.expanduser("~"), os.getcwd())}
+    if real in protected:
+        raise RuntimeError(f"PROMETHEUS_MULTIPROC_DIR must be a dedicated directory, not {path!r}")
+
+    marker = os.path.join(real, MULTIPROC_MARKER)
+    if not os.path.isdir(real) or not os.listdir(real):
+        os.makedirs(real, exist_ok=True)
+        open(marker, "w").close()
+    elif not os.path.exists(marker):
+        logging.getLogger("gunicorn.error").warning(
+            "%s was not created by AgriMind; leaving its files in place (metrics may include old samples)", path
+        )
+        return
+
+    for sample_file in glob.glob(os.path.join(real, "*.db")):
+        os.remove(sample_file)
+
+
+prepare_multiproc_dir(PROMETHEUS_MULTIPROC_DIR)
+
+from prometheus_client import multiprocess
+
+from app.runtime import memory_footprint, format_footprint
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+# AGRIMIND_WARMUP=0 skips schema creation and model loading in the master
+warmup = os.environ.get("AGRIMIND_WARMUP", "1") != "0"
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def when_ready(server):
+    # Workers inherit the loaded models instead of each loading its own copy on
+    # their first request
+    if warmup:
+        import app as agrimind
+        agrimind.initialize(agrimind.app)
+    logger.info("master memory: %s", format_footprint(memory_footprint()))
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+    logger.info("worker memory after fork: %s", format_footprint(memory_footprint()))
+
+
+def post_worker_init(worker):
+    logger.info("worker %s ready in %.0f ms", worker.pid, (time.perf_counter() - worker.forked_at) * 1000)
+
+
+def worker_exit(server, worker):
+    # Pss of each worker sums to the real total across the pool
+    logger.info("worker %s memory at exit: %s", worker.pid, format_footprint(memory_footprint(worker.pid)))
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges (in-flight counts) from /metrics
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,260 @@
+# Flask/loadtest/fake_upstreams.py
+#
+# One local HTTP server that answers like SoilGrids, Open-Meteo, Groq and Gemini,
+# with configurable latency and error injection per upstream.
+#
+#   python -m loadtest.fake_upstreams --port 18080 --latency soilgrids=0.8 --error-rate groq=0.05
+#
+# Point the app at it with the env vars printed on startup.
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+UPSTREAMS = ("soilgrids", "openmeteo", "groq", "gemini")
+
+SOILGRIDS_PATH = "/soilgrids/v2.0/properties/query"
+OPEN_METEO_PATH = "/v1/forecast"
+GROQ_PATH = "/openai/v1/chat/completions"
+GEMINI_PREFIX = "/v1beta/models"
+
+# Default per-upstream latency (seconds), roughly what the real services show
+DEFAULT_LATENCY = {"soilgrids": 0.6, "openmeteo": 0.15, "groq": 0.4, "gemini": 0.6}
+
+ANSWER = "Test your soil pH, sow after the first good rains, and apply fertilizer in split doses."
+
+
+@dataclass
+class FaultProfile:
+    """Latency (seconds, +/- jitter fraction) and error rate for one upstream."""
+    latency: float = 0.0
+    jitter: float = 0.25
+    error_rate: float = 0.0
+    error_status: int = 503
+    token_delay: float = 0.01
+    requests: int = 0
+    errors: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def delay(self):
+        if self.latency:
+            time.sleep(max(0.0, self.latency * (1 + random.uniform(-self.jitter, self.jitter))))
+
+    def should_fail(self):
+        fail = random.random() < self.error_rate
+        with self._lock:
+            self.requests += 1
+            self.errors += fail
+        return fail
+
+
+def soilgrids_body(lon, lat, properties, depths):
+    # Same shape as SoilGrids v2.0: phh2o is stored as pH*10 (d_factor 10)
+    values = {"phh2o": 55 + int(abs(lat * 7 + lon * 3)) % 30, "nitrogen": 80 + int(abs(lat * 13 + lon)) % 120}
+    layers = []
+    for name in properties:
+        layers.append({
+            "name": name,
+            "unit_measure": {"d_factor": 10 if name == "phh2o" else 100, "mapped_units": "", "target_units": ""},
+            "depths": [{"label": depth, "values": {"mean": values.get(name, 100)}} for depth in depths],
+        })
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {"layers": layers}}
+
+
+def open_meteo_body(lat, lon, current, daily, days):
+    base = 24 + (lat % 10)
+    body = {"latitude": lat, "longitude": lon, "timezone": "GMT"}
+    if current:
+        body["current"] = {
+            "temperature_2m": round(base, 1), "relative_humidity_2m": 65,
+            "precipitation": 0.4, "wind_speed_10m": 11.2,
+        }
+    if daily:
+        body["daily"] = {
+            "time": [f"2025-10-{4 + i:02d}" for i in range(days)],
+            "temperature_2m_max": [round(base + 6 + i * 0.3, 1) for i in range(days)],
+            "temperature_2m_min": [round(base - 6 + i * 0.2, 1) for i in range(days)],
+            "precipitation_sum": [round((i * 3.7) % 11, 1) for i in range(days)],
+            "wind_speed_10m_max": [14.0 + i for i in range(days)],
+        }
+    return body
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    profiles = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    # -----------------------------
+    # Helpers
+    # -----------------------------
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_sse(self, events, token_delay):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for event in events:
+            self.wfile.write(f"data: {event}\n\n".encode())
+            self.wfile.flush()
+            if token_delay:
+                time.sleep(token_delay)
+        self.close_connection = True
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _fault(self, upstream):
+        """Apply injected latency; True if the request was answered with an error."""
+        profile = self.profiles[upstream]
+        profile.delay()
+        if profile.should_fail():
+            self._send_json({"error": f"injected {upstream} failure"}, profile.error_status)
+            return True
+        return False
+
+    # -----------------------------
+    # Routes
+    # -----------------------------
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == SOILGRIDS_PATH:
+            if self._fault("soilgrids"):
+                return
+            self._send_json(soilgrids_body(
+                float(query.get("lon", [0])[0]), float(query.get("lat", [0])[0]),
+                query.get("property", ["phh2o"]), query.get("depth", ["0-5cm"]),
+            ))
+        elif url.path == OPEN_METEO_PATH:
+            if self._fault("openmeteo"):
+                return
+            self._send_json(open_meteo_body(
+                float(query.get("latitude", [0])[0]), float(query.get("longitude", [0])[0]),
+                "current" in query, "daily" in query, int(query.get("forecast_days", [5])[0]),
+            ))
+        elif url.path.startswith(GEMINI_PREFIX + "/"):
+            # Model metadata, used by the Gemini model probe
+            self._send_json({"name": "models/" + url.path.rsplit("/", 1)[-1]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        payload = self._read_json()
+
+        if url.path == GROQ_PATH:
+            if self._fault("groq"):
+                return
+            if payload.get("stream"):
+                events = [json.dumps({"choices": [{"delta": {"content": (" " if i else "") + word}}]})
+                          for i, word in enumerate(ANSWER.split(" "))]
+                self._send_sse(events + ["[DONE]"], self.profiles["groq"].token_delay)
+            else:
+                self._send_json({"choices": [{"message": {"role": "assistant", "content": ANSWER}}]})
+        elif url.path.startswith(GEMINI_PREFIX + "/") and ":" in url.path:
+            if self._fault("gemini"):
+                return
+            if url.path.endswith(":streamGenerateContent"):
+                events = [json.dumps({"candidates": [{"content": {"parts": [{"text": (" " if i else "") + word}]}}]})
+                          for i, word in enumerate(ANSWER.split(" "))]
+                self._send_sse(events, self.profiles["gemini"].token_delay)
+            else:
+                self._send_json({"candidates": [{"content": {"parts": [{"text": ANSWER}], "role": "model"}}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+
+def _parse_pairs(items, cast=float):
+    """["soilgrids=0.5", "groq=0.1"] -> {"soilgrids": 0.5, "groq": 0.1}; "all=x" sets every upstream."""
+    values = {}
+    for item in items or []:
+        name, _, value = item.partition("=")
+        names = UPSTREAMS if name == "all" else (name,)
+        for upstream in names:
+            if upstream not in UPSTREAMS:
+                raise ValueError(f"Unknown upstream {upstream!r}; expected one of {', '.join(UPSTREAMS)}")
+            values[upstream] = cast(value)
+    return values
+
+
+def build_profiles(latency=None, error_rate=None, jitter=0.25, token_delay=0.01):
+    latency = {**DEFAULT_LATENCY, **(latency or {})}
+    error_rate = error_rate or {}
+    return {
+        name: FaultProfile(latency=latency[name], jitter=jitter,
+                           error_rate=error_rate.get(name, 0.0), token_delay=token_delay)
+        for name in UPSTREAMS
+    }
+
+
+def start_server(host="127.0.0.1", port=0, profiles=None):
+    """Start the fake upstreams on a daemon thread; returns the running server."""
+    handler = type("Handler", (FakeUpstreamHandler,), {"profiles": profiles or build_profiles()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-upstreams", daemon=True).start()
+    return server
+
+
+def upstream_env(server):
+    """Env vars that point services.py and app/llm.py at `server`."""
+    host, port = server.server_address[:2]
+    base = f"http://{host}:{port}"
+    return {
+        "SOILGRIDS_URL": base + SOILGRIDS_PATH,
+        "OPEN_METEO_URL": base + OPEN_METEO_PATH,
+        "GROQ_URL": base + GROQ_PATH,
+        "GEMINI_BASE_URL": base + GEMINI_PREFIX,
+        "GROQ_API_KEY": "loadtest",
+        "GEMINI_API_KEY": "loadtest",
+    }
+
+
+def add_fault_arguments(parser):
+    parser.add_argument("--latency", nargs="*", metavar="UPSTREAM=SECONDS",
+                        help=f"mean latency per upstream (defaults: {DEFAULT_LATENCY})")
+    parser.add_argument("--error-rate", nargs="*", metavar="UPSTREAM=FRACTION",
+                        help="fraction of requests answered with HTTP 503")
+    parser.add_argument("--jitter", type=float, default=0.25, help="latency jitter as a fraction of the mean")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed LLM tokens")
+
+
+def profiles_from_args(args):
+    return build_profiles(_parse_pairs(args.latency), _parse_pairs(args.error_rate), args.jitter, args.token_delay)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake SoilGrids / Open-Meteo / Groq / Gemini")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = start_server(args.host, args.port, profiles_from_args(args))
+    for name, value in upstream_env(server).items():
+        print(f"export {name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
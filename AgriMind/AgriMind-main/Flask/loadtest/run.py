@@ -0,0 +1,267 @@
+# Flask/loadtest/run.py
+#
+# End-to-end load test: starts the fake upstreams, serves the app under gunicorn
+# pointed at them, drives mixed traffic and reports throughput and p50/p95/p99
+# per route.
+#
+#   cd Flask
+#   python -m loadtest.run --duration 30 --concurrency 16
+#   python -m loadtest.run --latency soilgrids=2 --error-rate openmeteo=0.2 --out load.json
+#   python -m loadtest.run --base-url http://localhost:5000   # an app you started yourself
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from loadtest.fake_upstreams import add_fault_arguments, profiles_from_args, start_server, upstream_env
+
+FLASK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative weight of each route in the traffic mix
+DEFAULT_MIX = {
+    "predict": 35,
+    "predict_yield": 20,
+    "weather": 15,
+    "soil": 15,
+    "agribot": 8,
+    "agribot_stream": 4,
+    "ai_ask": 3,
+}
+
+YIELD_CROPS = ["rice", "wheat", "maize", "cotton", "jute", "banana", "mango", "chickpea", "coffee", "lentil"]
+
+
+# -----------------------------
+# Request builders
+# -----------------------------
+class TrafficMix:
+    """Builds randomized requests; coordinates and questions come from fixed pools
+    so upstream caches see a realistic mix of hits and misses."""
+
+    def __init__(self, mix, locations=200, questions=50, seed=0):
+        self.rng = random.Random(seed)
+        self.routes = list(mix)
+        self.weights = [mix[name] for name in self.routes]
+        self.locations = [(round(self.rng.uniform(8, 30), 4), round(self.rng.uniform(70, 88), 4))
+                          for _ in range(locations)]
+        self.questions = [f"How much fertilizer should I use for {self.rng.choice(YIELD_CROPS)} on plot {i}?"
+                          for i in range(questions)]
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            route = self.rng.choices(self.routes, self.weights)[0]
+            return route, getattr(self, "_" + route)(self.rng)
+
+    def _location(self, rng):
+        lat, lon = rng.choice(self.locations)
+        return {"latitude": lat, "longitude": lon}
+
+    def _predict(self, rng):
+        return "/predict", {
+            "N": rng.uniform(0, 140), "P": rng.uniform(5, 145), "K": rng.uniform(5, 205),
+            "temperature": rng.uniform(10, 40), "rainfall": rng.uniform(20, 300),
+            "pH": rng.uniform(4, 9), "humidity": rng.uniform(15, 100),
+        }, False
+
+    def _predict_yield(self, rng):
+        numeric = [rng.uniform(0, 140), rng.uniform(5, 145), rng.uniform(5, 205), rng.uniform(10, 40),
+                   rng.uniform(15, 100), rng.uniform(4, 9), rng.uniform(20, 300), rng.uniform(10, 50),
+                   rng.uniform(4, 10), rng.uniform(1, 100)]
+        return "/predict_yield", {"numeric_features": numeric, "crops": rng.sample(YIELD_CROPS, 3)}, False
+
+    def _weather(self, rng):
+        return "/api/weather", self._location(rng), False
+
+    def _soil(self, rng):
+        return "/api/soil", self._location(rng), False
+
+    def _agribot(self, rng):
+        return "/api/agribot", {"question": rng.choice(self.questions)}, False
+
+    def _agribot_stream(self, rng):
+        return "/api/agribot?format=ndjson", {"question": rng.choice(self.questions), "stream": True}, True
+
+    def _ai_ask(self, rng):
+        return "/api/ai/ask", {"question": rng.choice(self.questions)}, False
+
+
+# -----------------------------
+# Load generation
+# -----------------------------
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def add(self, route, seconds, status):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+            if not (isinstance(status, int) and status < 400):
+                self.errors[route] += 1
+
+
+def _user(base_url, traffic, recorder, deadline, timeout):
+    session = requests.Session()
+    while time.monotonic() < deadline:
+        route, (path, payload, stream) = traffic.next()
+        start = time.perf_counter()
+        try:
+            r = session.post(base_url + path, json=payload, timeout=timeout, stream=stream)
+            # Latency is measured to the last byte, including streamed answers
+            for _ in r.iter_content(chunk_size=None):
+                pass
+            status = r.status_code
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        recorder.add(route, time.perf_counter() - start, status)
+
+
+def drive(base_url, traffic, duration, concurrency, timeout=60):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(_user, base_url, traffic, recorder, deadline, timeout)
+    return recorder, time.perf_counter() - started
+
+
+def report(recorder, elapsed):
+    routes = {}
+    total = 0
+    for route, samples in sorted(recorder.latencies.items()):
+        ms = np.asarray(samples) * 1000
+        total += len(samples)
+        routes[route] = {
+            "requests": len(samples),
+            "errors": recorder.errors[route],
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2),
+            "max_ms": round(float(ms.max()), 2),
+            "statuses": {str(k): v for k, v in recorder.statuses[route].items()},
+        }
+    return {"elapsed_s": round(elapsed, 2), "requests": total, "rps": round(total / elapsed, 2), "routes": routes}
+
+
+def print_report(result, profiles):
+    print(f"\n{'route':16s} {'reqs':>7s} {'errors':>7s} {'rps':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for route, r in result["routes"].items():
+        print(f"{route:16s} {r['requests']:7d} {r['errors']:7d} {r['rps']:8.1f} "
+              f"{r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f}")
+    print(f"{'total':16s} {result['requests']:7d} {'':7s} {result['rps']:8.1f}   in {result['elapsed_s']} s")
+    if profiles:
+        print("\nupstream calls: " + ", ".join(
+            f"{name} {p.requests} ({p.errors} injected errors)" for name, p in profiles.items()))
+
+
+# -----------------------------
+# App under test
+# -----------------------------
+def start_app(port, env, workers, threads, target, log_path):
+    env = {**os.environ, **env, "PORT": str(port), "WEB_CONCURRENCY": str(workers), "GUNICORN_THREADS": str(threads)}
+    # The real LLM providers are what the fake upstreams stand in for
+    env.pop("LLM_PROVIDER", None)
+    log = open(log_path, "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", target],
+        cwd=FLASK_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {proc.returncode}; see {log_path}")
+        try:
+            if requests.get(base_url + "/", timeout=1).status_code == 200:
+                return proc, base_url
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError(f"gunicorn did not become ready; see {log_path}")
+
+
+def _parse_mix(value):
+    if not value:
+        return DEFAULT_MIX
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown route {name!r}; expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AgriMind end-to-end load test")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of traffic")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client connections")
+    parser.add_argument("--mix", help="route weights, e.g. predict=50,weather=50 (default: %s)" %
+                        ",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    parser.add_argument("--locations", type=int, default=200, help="distinct coordinates for weather/soil")
+    parser.add_argument("--questions", type=int, default=50, help="distinct AgriBot questions")
+    parser.add_argument("--base-url", help="load an already running app instead of starting one")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--target", default="app:app", help="gunicorn app target")
+    parser.add_argument("--out", help="write the report JSON here")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    traffic = TrafficMix(_parse_mix(args.mix), args.locations, args.questions)
+    profiles = None
+    proc = None
+    workdir = tempfile.mkdtemp(prefix="agrimind-loadtest-")
+
+    try:
+        if args.base_url:
+            base_url = args.base_url.rstrip("/")
+        else:
+            profiles = profiles_from_args(args)
+            upstreams = start_server(profiles=profiles)
+            env = {
+                **upstream_env(upstreams),
+                # Fresh database and caches, so runs start cold and nothing in instance/ changes
+                "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'agrimind.db')}",
+                "CACHE_DIR": workdir,
+            }
+            log_path = os.path.join(workdir, "gunicorn.log")
+            proc, base_url = start_app(args.port, env, args.workers, args.threads, args.target, log_path)
+            print(f"app ready at {base_url} (log: {log_path})")
+
+        print(f"driving {args.concurrency} connections for {args.duration:g} s ...")
+        recorder, elapsed = drive(base_url, traffic, args.duration, args.concurrency)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    result = report(recorder, elapsed)
+    print_report(result, profiles)
+    if args.out:
+        result["config"] = {k: v for k, v in vars(args).items() if k != "out"}
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Report saved at {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+
+def artifact_version(*paths):
+    """
+    Short fingerprint of model artifacts on disk (path, size and mtime of each).
+
+    It changes whenever a training run rewrites an artifact, so it can key caches
+    of model outputs and tell long-running processes to reload.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+# Callbacks (name, seconds) run after each model load, e.g. to export load times
+_load_observers = []
+
+
+def on_load(callback):
+    _load_observers.append(callback)
+    return callback
+
+
+@contextmanager
+def timed_load(name):
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    for callback in _load_observers:
+        callback(name, elapsed)
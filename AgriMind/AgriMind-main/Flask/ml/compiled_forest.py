@@ -0,0 +1,296 @@
+import os
+import sys
+import time
+import joblib
+import numpy as np
+
+# -----------------------------
+# Array-compiled random forest inference
+#
+# sklearn's predict/predict_proba on a 200-tree forest spends most of a single-row
+# call in input validation and per-tree dispatch. CompiledForest flattens every
+# tree into shared contiguous node arrays and walks all trees at once with NumPy.
+# -----------------------------
+
+INFERENCE_ENGINE = os.environ.get("AGRIMIND_INFERENCE_ENGINE", "sklearn").lower()
+# "r" maps compiled artifacts read-only; set AGRIMIND_MODEL_MMAP=off to load them into memory
+MMAP_MODE = None if os.environ.get("AGRIMIND_MODEL_MMAP", "r").lower() in ("", "0", "off", "none") else "r"
+# Rows walked through the forest at a time. The leaf values gathered for one chunk
+# are rows x trees x classes floats (~14 MB for 256 rows, 200 trees, 35 crops), so
+# large batches cost time but not memory.
+CHUNK_ROWS = int(os.environ.get("AGRIMIND_FOREST_CHUNK_ROWS", "256"))
+
+
+def _float32_thresholds(threshold):
+    """
+    Cast split thresholds to float32 without changing any decision.
+
+    sklearn compares float32 inputs against float64 thresholds. Rounding each
+    threshold down to the nearest float32 keeps `x <= t` identical for every
+    float32 x, so the compiled forest matches sklearn exactly.
+    """
+    t32 = threshold.astype(np.float32)
+    too_big = t32.astype(np.float64) > threshold
+    t32[too_big] = np.nextafter(t32[too_big], np.float32(-np.inf))
+    return t32
+
+
+class CompiledForest:
+    """
+    Flat-array evaluator for fitted RandomForestClassifier/RandomForestRegressor.
+
+    Node arrays hold every tree back to back. Leaves point to themselves with an
+    infinite threshold, so a fixed number of vectorized steps (the forest depth)
+    brings every (row, tree) pair to its leaf.
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_id, leaf_value,
+                 roots, max_depth, n_features, classes=None, chunk_rows=CHUNK_ROWS):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_id = leaf_id
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.classes_ = classes
+        self.chunk_rows = max(1, int(chunk_rows))
+
+    @property
+    def is_classifier(self):
+        return self.classes_ is not None
+
+    @classmethod
+    def from_sklearn(cls, forest, dtype=np.float64):
+        """
+        Export a fitted sklearn forest. `dtype` sets the precision of the leaf
+        values (np.float32 halves their memory at ~1e-7 relative error).
+        """
+        classes = getattr(forest, "classes_", None)
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("CompiledForest only supports single-output forests")
+
+        features, thresholds, lefts, rights, leaf_ids, values, roots = [], [], [], [], [], [], []
+        node_offset = 0
+        leaf_offset = 0
+        max_depth = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(n_nodes)
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            threshold = np.where(is_leaf, np.inf, tree.threshold)
+            left = np.where(is_leaf, node_ids, tree.children_left) + node_offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + node_offset
+
+            leaf_id = np.full(n_nodes, -1, dtype=np.int64)
+            leaf_id[is_leaf] = np.arange(is_leaf.sum()) + leaf_offset
+
+            value = tree.value[is_leaf, 0, :]
+            if classes is not None:
+                # Per-leaf class distribution, as DecisionTreeClassifier.predict_proba does
+                totals = value.sum(axis=1, keepdims=True)
+                totals[totals == 0.0] = 1.0
+                value = value / totals
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            leaf_ids.append(leaf_id)
+            values.append(value)
+            roots.append(node_offset)
+
+            node_offset += n_nodes
+            leaf_offset += int(is_leaf.sum())
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=_float32_thresholds(np.concatenate(thresholds)),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int32),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int32),
+            leaf_id=np.ascontiguousarray(np.concatenate(leaf_ids), dtype=np.int32),
+            leaf_value=np.ascontiguousarray(np.concatenate(values), dtype=dtype),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=forest.n_features_in_,
+            classes=classes,
+        )
+
+    def _leaf_values(self, X):
+        """Leaf values reached by each (row, tree) pair: shape (n_rows, n_trees, n_outputs)."""
+        node = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0)
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.leaf_value[self.leaf_id[node]]
+
+    def _mean_leaf_values(self, X):
+        """Leaf values averaged over trees, shape (n_rows, n_outputs), chunk_rows rows at a time."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features_in_}")
+
+        mean = np.empty((X.shape[0], self.leaf_value.shape[1]), dtype=np.float64)
+        for start in range(0, X.shape[0], self.chunk_rows):
+            chunk = slice(start, start + self.chunk_rows)
+            mean[chunk] = self._leaf_values(X[chunk]).mean(axis=1, dtype=np.float64)
+        return mean
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._mean_leaf_values(X)
+
+    def predict(self, X):
+        mean = self._mean_leaf_values(X)
+        if self.is_classifier:
+            return self.classes_[np.argmax(mean, axis=1)]
+        return mean[:, 0]
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right,
+                                      self.leaf_id, self.leaf_value, self.roots))
+
+    def save(self, path):
+        """
+        Write the node arrays uncompressed, so load(mmap_mode="r") can map them
+        straight from the page cache instead of copying them into each process.
+        """
+        # A plain dict of arrays keeps the artifact independent of where this class lives
+        joblib.dump({
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "leaf_id": self.leaf_id,
+            "leaf_value": self.leaf_value,
+            "roots": self.roots,
+            "max_depth": self.max_depth,
+            "n_features": self.n_features_in_,
+            "classes": self.classes_,
+        }, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        return cls(**joblib.load(path, mmap_mode=mmap_mode))
+
+
+def compiled_path(model_path):
+    """crop_model.pkl -> crop_model.forest.joblib"""
+    return os.path.splitext(model_path)[0] + ".forest.joblib"
+
+
+def maybe_compile(model):
+    """Swap in the compiled engine when AGRIMIND_INFERENCE_ENGINE=compiled."""
+    if INFERENCE_ENGINE == "compiled":
+        return CompiledForest.from_sklearn(model)
+    return model
+
+
+def load_model(model_path):
+    """
+    Load a forest for inference.
+
+    With the compiled engine and an exported .forest.joblib next to the pickle, the
+    node arrays are memory-mapped read-only: gunicorn workers (especially with
+    preload_app) then share one copy of the model in the page cache instead of
+    each holding a private one. Otherwise the sklearn pickle is loaded as before.
+    """
+    forest_path = compiled_path(model_path)
+    if INFERENCE_ENGINE == "compiled" and os.path.exists(forest_path):
+        return CompiledForest.load(forest_path, mmap_mode=MMAP_MODE)
+    return maybe_compile(joblib.load(model_path))
+
+
+def export_compiled(model_path, model=None, dtype=np.float64):
+    """Write the mmap-friendly compiled artifact for a saved sklearn forest."""
+    if model is None:
+        model = joblib.load(model_path)
+    forest_path = compiled_path(model_path)
+    CompiledForest.from_sklearn(model, dtype=dtype).save(forest_path)
+    return forest_path
+
+
+# -----------------------------
+# Parity check and latency comparison against sklearn
+# Run from the Flask directory: python -m ml.compiled_forest
+# `python -m ml.compiled_forest export` writes the .forest.joblib artifacts instead
+# The parity check also runs under pytest (tests/test_compiled_forest.py).
+# -----------------------------
+def crop_dataset():
+    """Training CSV features of the crop recommender, in model column order."""
+    import pandas as pd
+    from ml.crop_recommender import model_training as crop_training
+
+    return pd.read_csv(crop_training.ORIGINAL_CSV_PATH)[crop_training.FEATURES].to_numpy()
+
+
+def yield_dataset():
+    """Training CSV of the yield model, one-hot encoded to the model's feature columns."""
+    import pandas as pd
+    from ml.yield_predictor import yield_model_training as yield_training
+
+    yield_columns = list(joblib.load(yield_training.FEATURE_PATH))
+    yield_df = pd.read_csv(yield_training.CSV_PATH)
+    yield_df['label'] = yield_df['label'].str.lower()
+    return (pd.get_dummies(yield_df, columns=['label'], dtype=int)
+            .reindex(columns=yield_columns, fill_value=0).to_numpy(dtype=np.float64))
+
+
+def _latency(fn, X, repeats):
+    timings = []
+    for i in range(repeats):
+        row = X[i % len(X)][np.newaxis, :]
+        start = time.perf_counter()
+        fn(row)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def _compare(name, sk_fn, compiled_fn, X, repeats=300):
+    sk_out = sk_fn(X)
+    compiled_out = compiled_fn(X)
+    max_diff = float(np.max(np.abs(sk_out - compiled_out)))
+    sk_p50, sk_p99 = _latency(sk_fn, X, repeats)
+    c_p50, c_p99 = _latency(compiled_fn, X, repeats)
+    print(f"{name}: max |sklearn - compiled| = {max_diff:.2e} over {len(X)} rows")
+    print(f"  single-row sklearn  p50 {sk_p50:.3f} ms  p99 {sk_p99:.3f} ms")
+    print(f"  single-row compiled p50 {c_p50:.3f} ms  p99 {c_p99:.3f} ms")
+    return max_diff
+
+
+if __name__ == "__main__":
+    from ml.crop_recommender import model_training as crop_training
+    from ml.yield_predictor import yield_model_training as yield_training
+
+    if sys.argv[1:] == ["export"]:
+        for path in (crop_training.MODEL_PATH, yield_training.MODEL_PATH):
+            print(f"Compiled forest saved at {export_compiled(path)}")
+        sys.exit(0)
+
+    crop_model = joblib.load(crop_training.MODEL_PATH)
+    crop_X = crop_dataset()
+    compiled_crop = CompiledForest.from_sklearn(crop_model)
+    print(f"crop model: {compiled_crop.nbytes / 1e6:.1f} MB of node arrays, depth {compiled_crop.max_depth}")
+    crop_diff = _compare("crop predict_proba", crop_model.predict_proba, compiled_crop.predict_proba, crop_X)
+
+    yield_model = joblib.load(yield_training.MODEL_PATH)
+    yield_X = yield_dataset()
+    compiled_yield = CompiledForest.from_sklearn(yield_model)
+    print(f"yield model: {compiled_yield.nbytes / 1e6:.1f} MB of node arrays, depth {compiled_yield.max_depth}")
+    yield_diff = _compare("yield predict", yield_model.predict, compiled_yield.predict, yield_X)
+
+    assert crop_diff < 1e-9 and yield_diff < 1e-9, "compiled forest diverges from sklearn"
+    print("Parity OK")
@@ -1,65 +1,102 @@
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-import joblib  # for saving/loading model
+import os
 
-# Load datasets
-original_df = pd.read_csv("Flask\ml\Crop_recommendation.csv")
-synthetic_df = pd.read_csv("Flask\ml\synthetic_missing_crops.csv")
+# pandas, scikit-learn and joblib are imported inside the functions below, so
+# inference can import FEATURES without pulling in the training stack
 
-# Combine datasets
-data = pd.concat([original_df, synthetic_df], ignore_index=True)
+# -----------------------------
+# Paths relative to this file
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ORIGINAL_CSV_PATH = os.path.join(BASE_DIR, "Crop_recommendation.csv")
+SYNTHETIC_CSV_PATH = os.path.join(BASE_DIR, "synthetic_missing_crops.csv")
+MODEL_PATH = os.path.join(BASE_DIR, "crop_model.pkl")
+LE_PATH = os.path.join(BASE_DIR, "label_encoder.pkl")
 
-# Features and target
-X = data[['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']]
-y = data['label']
+# Column order of every feature row the model sees, at training and at inference
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
 
-# Encode target
-le = LabelEncoder()
-y_encoded = le.fit_transform(y)
 
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
-)
+def train_and_save():
+    """
+    Train the crop recommender and write crop_model.pkl / label_encoder.pkl.
+
+    This is the offline entry point: run `python -m ml.crop_recommender.model_training`
+    from the Flask directory. Inference code only loads the saved artifacts.
+    """
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestClassifier
+    import joblib  # for saving/loading model
+
+    from ml.compiled_forest import export_compiled
+
+    # Load datasets
+    original_df = pd.read_csv(ORIGINAL_CSV_PATH)
+    synthetic_df = pd.read_csv(SYNTHETIC_CSV_PATH)
+
+    # Combine datasets
+    data = pd.concat([original_df, synthetic_df], ignore_index=True)
+
+    # Features and target
+    X = data[FEATURES]
+    y = data['label']
+
+    # Encode target
+    le = LabelEncoder()
+    y_encoded = le.fit_transform(y)
+
+    # Train-test split
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
+    )
 
-# Train model
-model = RandomForestClassifier(n_estimators=200, random_state=42)
-model.fit(X_train, y_train)
+    # Train model (on plain arrays, which is what inference passes in)
+    model = RandomForestClassifier(n_estimators=200, random_state=42)
+    model.fit(X_train.to_numpy(), y_train)
+    print(f"Test accuracy: {model.score(X_test.to_numpy(), y_test):.3f}")
 
-# Save model and label encoder
-joblib.dump(model, "crop_model.pkl")
-joblib.dump(le, "label_encoder.pkl")
+    # Save model and label encoder
+    joblib.dump(model, MODEL_PATH)
+    joblib.dump(le, LE_PATH)
+    print(f"Model saved at {MODEL_PATH}")
+    print(f"Label encoder saved at {LE_PATH}")
 
+    # mmap-friendly copy for AGRIMIND_INFERENCE_ENGINE=compiled
+    print(f"Compiled forest saved at {export_compiled(MODEL_PATH, model)}")
 
+    return model, le
 
 
 # Prediction function
 def predict_top_crops(model, le, feature_list, k=3):
     """
     Predict top K crops for a given input feature list.
-    
+
     Args:
         model : trained classifier
         le : LabelEncoder
         feature_list : list of features [N, P, K, temperature, humidity, ph, rainfall]
         k : number of top crops to return (default 3)
-        
+
     Returns:
         List of tuples: [(crop_name, probability), ...]
     """
+    import numpy as np
+
     # Ensure 2D array
     input_array = [feature_list] if isinstance(feature_list[0], (int, float)) else feature_list
-    
+
     # Predict probabilities
     probs = model.predict_proba(input_array)[0]
-    
+
     # Sort by probability descending
     sorted_indices = np.argsort(probs)[::-1]
-    
+
     # Return top K crops
     top_crops = [(le.classes_[idx], round(probs[idx], 3)) for idx in sorted_indices[:k]]
-    
-    return top_crops
\ No newline at end of file
+
+    return top_crops
+
+
+if __name__ == "__main__":
+    train_and_save()
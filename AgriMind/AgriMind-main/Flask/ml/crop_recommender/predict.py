@@ -1,27 +1,84 @@
 import os
+import threading
 import joblib
+import numpy as np
+
+from ml.artifacts import artifact_version, timed_load
+from ml.compiled_forest import compiled_path, load_model
 
 # Load trained model and label encoder
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "crop_model.pkl")
 LE_PATH = os.path.join(BASE_DIR, "label_encoder.pkl")
 
-model = joblib.load(MODEL_PATH)
-le = joblib.load(LE_PATH)
+ARTIFACT_PATHS = (MODEL_PATH, compiled_path(MODEL_PATH), LE_PATH)
+
+
+def _load():
+    version = artifact_version(*ARTIFACT_PATHS)
+    # AGRIMIND_INFERENCE_ENGINE=compiled swaps in the flat-array forest evaluator
+    # (memory-mapped from crop_model.forest.joblib when that artifact exists)
+    with timed_load("crop"):
+        model = load_model(MODEL_PATH)
+        le = joblib.load(LE_PATH)
+    # Crop name for each predict_proba column, resolved once instead of per request
+    class_names = le.inverse_transform(model.classes_)
+    return model, le, class_names, version
+
+
+# Loaded together so a reload never pairs a new model with old class names
+_state = _load()
+model, le, CLASS_NAMES, MODEL_VERSION = _state
+_reload_lock = threading.Lock()
+
+
+def reload_if_changed():
+    """
+    Reload the artifacts if a training run replaced them.
+    Returns the version of the model now serving predictions.
+    """
+    global _state, model, le, CLASS_NAMES, MODEL_VERSION
+    if artifact_version(*ARTIFACT_PATHS) != _state[3]:
+        with _reload_lock:
+            if artifact_version(*ARTIFACT_PATHS) != _state[3]:
+                _state = _load()
+                model, le, CLASS_NAMES, MODEL_VERSION = _state
+    return _state[3]
+
+
+def predict_top_crops_batch(X, k=3):
+    """
+    X: 2D list/array of feature rows
+    Returns: one list of (crop_name, probability) tuples per row, best first
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+
+    current_model, _, class_names, _ = _state
+    probs = current_model.predict_proba(X)
+    k = max(1, min(k, probs.shape[1]))
+
+    # Stable sort so ties (often several classes at 0.0) keep class order, as the
+    # per-row sorted() did; argpartition would pick tied classes arbitrarily
+    top_idx = np.argsort(-probs, axis=1, kind="stable")[:, :k]
+    top_probs = np.take_along_axis(probs, top_idx, axis=1)
+
+    names = class_names[top_idx].tolist()
+    return [list(zip(row_names, row_probs)) for row_names, row_probs in zip(names, top_probs.tolist())]
+
 
-def predict_top_crops_from_features(X):
+def predict_top_crops_from_features(X, k=3):
     """
     X: 2D list of feature values
-    Returns: list of tuples [(crop_name, probability), ...]
+    Returns: list of tuples [(crop_name, probability), ...] for the first row
     """
-    probs = model.predict_proba(X)[0]  # assuming sklearn classifier with predict_proba
-    classes = le.inverse_transform(range(len(probs)))
-    top3 = sorted(zip(classes, probs), key=lambda x: x[1], reverse=True)[:3]
-    return top3
+    X = np.asarray(X, dtype=np.float64)
+    return predict_top_crops_batch(X[:1] if X.ndim == 2 else X, k=k)[0]
 
 # Optional test
 if __name__ == "__main__":
-    sample_input = [[90, 40, 30, 28, 1200, 6.5, 85]]  # example
+    sample_input = [[90, 40, 30, 28, 85, 6.5, 1200]]  # N, P, K, temperature, humidity, ph, rainfall
     top3 = predict_top_crops_from_features(sample_input)
     print("Top 3 crop suggestions:")
     for crop, prob in top3:
@@ -1,8 +1,109 @@
-from yield_model_training import predict_yield_for_crops
+import os
+import threading
+import joblib
+import numpy as np
+
+from ml.artifacts import artifact_version, timed_load
+from ml.compiled_forest import compiled_path, load_model
+
+# -----------------------------
+# Artifacts written by yield_model_training.py
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'crop_yield_model.pkl')
+FEATURE_PATH = os.path.join(BASE_DIR, 'feature_columns.pkl')
+
+ARTIFACT_PATHS = (MODEL_PATH, compiled_path(MODEL_PATH), FEATURE_PATH)
+
+NUMERIC_FEATURES = ['N','P','K','temperature','humidity','ph','rainfall','soil_moisture','sunlight_hours','farm_size']
+
+
+class YieldPredictor:
+    """
+    Process-wide yield predictor: the model and feature order are loaded once and
+    every request is answered with a single vectorized model.predict call.
+    """
+
+    def __init__(self, model, feature_columns, version=None):
+        self.model = model
+        self.version = version
+        self.feature_columns = list(feature_columns)
+        self.n_features = len(self.feature_columns)
+
+        column_index = {col: i for i, col in enumerate(self.feature_columns)}
+        missing = [feat for feat in NUMERIC_FEATURES if feat not in column_index]
+        if missing:
+            raise ValueError(f"Feature columns are missing numeric features: {missing}")
+
+        # Column positions of the numeric inputs and of each one-hot crop column
+        self.numeric_index = np.array([column_index[feat] for feat in NUMERIC_FEATURES])
+        self.crop_index = {
+            col[len('label_'):]: i
+            for col, i in column_index.items() if col.startswith('label_')
+        }
+
+    @classmethod
+    def load(cls, model_path=MODEL_PATH, feature_path=FEATURE_PATH):
+        version = artifact_version(model_path, compiled_path(model_path), feature_path)
+        # AGRIMIND_INFERENCE_ENGINE=compiled swaps in the flat-array forest evaluator
+        # (memory-mapped from crop_yield_model.forest.joblib when that artifact exists)
+        with timed_load("yield"):
+            return cls(load_model(model_path), joblib.load(feature_path), version)
+
+    def build_matrix(self, numeric_input, crops):
+        """One row per crop: shared numeric features plus the crop's one-hot column."""
+        crop_names = [crop.lower() for crop in crops]
+        unknown = [crop for crop in crop_names if crop not in self.crop_index]
+        if unknown:
+            raise ValueError(f"Crop '{unknown[0]}' not recognized.")
+
+        X = np.zeros((len(crop_names), self.n_features), dtype=np.float64)
+        X[:, self.numeric_index] = np.asarray(numeric_input, dtype=np.float64)
+        X[np.arange(len(crop_names)), [self.crop_index[crop] for crop in crop_names]] = 1.0
+        return crop_names, X
+
+    def predict(self, numeric_input, crops):
+        if len(numeric_input) != len(NUMERIC_FEATURES):
+            raise ValueError(f"Numeric input must have {len(NUMERIC_FEATURES)} elements")
+        if not crops:
+            return {}
+
+        crop_names, X = self.build_matrix(numeric_input, crops)
+        predictions = self.model.predict(X)
+        return {crop: round(float(value), 3) for crop, value in zip(crop_names, predictions)}
+
+
+_predictor = None
+_predictor_lock = threading.Lock()
+
+
+def get_predictor(check_version=False):
+    """
+    Return the shared YieldPredictor, loading the artifacts on first use.
+    With check_version=True it is reloaded if a training run replaced them.
+    """
+    global _predictor
+    predictor = _predictor
+    if predictor is None or (check_version and artifact_version(*ARTIFACT_PATHS) != predictor.version):
+        with _predictor_lock:
+            predictor = _predictor
+            if predictor is None or (check_version and artifact_version(*ARTIFACT_PATHS) != predictor.version):
+                predictor = _predictor = YieldPredictor.load()
+    return predictor
+
+
+def predict_yield_for_crops(numeric_input, crops):
+    """
+    numeric_input: list of 10 numeric features
+    crops: list of crop names
+    Returns a dict {crop_name: predicted_yield}
+    """
+    return get_predictor().predict(numeric_input, crops)
+
 
 # Example usage
-numeric_features = [100, 50, 50, 27, 85, 6.5, 180, 40, 7, 5]
-top_3_crops = ['rice', 'wheat', 'maize']  # Example: output from crop recommendation model
+if __name__ == "__main__":
+    numeric_features = [100, 50, 50, 27, 85, 6.5, 180, 40, 7, 5]
+    top_3_crops = ['rice', 'wheat', 'maize']  # Example: output from crop recommendation model
 
-yields = predict_yield_for_crops(numeric_features, top_3_crops)
-print("Predicted yields (tonnes/ha):", yields)
+    yields = predict_yield_for_crops(numeric_features, top_3_crops)
+    print("Predicted yields (tonnes/ha):", yields)
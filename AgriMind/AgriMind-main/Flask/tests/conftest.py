@@ -0,0 +1,61 @@
+# Flask/tests/conftest.py
+#
+#   cd Flask
+#   python -m pytest tests
+#
+# Tests that need trained models are skipped until the offline training entry
+# points have written the artifacts (see README).
+import os
+import sys
+import tempfile
+
+import pytest
+
+FLASK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if FLASK_DIR not in sys.path:
+    sys.path.insert(0, FLASK_DIR)
+
+# Keep the tests away from instance/: a throwaway database and cache directory
+_workdir = tempfile.mkdtemp(prefix="agrimind-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_workdir, 'test.db')}")
+os.environ.setdefault("CACHE_DIR", _workdir)
+os.environ.setdefault("PREFETCH_ENABLED", "0")
+os.environ.setdefault("SECRET_KEY", "agrimind-test-secret")
+
+CROP_MODEL_PATH = os.path.join(FLASK_DIR, "ml", "crop_recommender", "crop_model.pkl")
+YIELD_MODEL_PATH = os.path.join(FLASK_DIR, "ml", "yield_predictor", "crop_yield_model.pkl")
+
+requires_crop_model = pytest.mark.skipif(
+    not os.path.exists(CROP_MODEL_PATH), reason="crop model not trained"
+)
+requires_yield_model = pytest.mark.skipif(
+    not os.path.exists(YIELD_MODEL_PATH), reason="yield model not trained"
+)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    from app.database import create_schema
+
+    flask_app = create_app()
+    create_schema(flask_app)
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope="session")
+def crop_rows():
+    """Training CSV rows as {request field: value} dicts, with their label."""
+    import pandas as pd
+    from ml.crop_recommender.model_training import FEATURES, ORIGINAL_CSV_PATH
+
+    df = pd.read_csv(ORIGINAL_CSV_PATH)
+    return [
+        ({"pH" if feature == "ph" else feature: float(row[feature]) for feature in FEATURES}, row["label"])
+        for _, row in df.iterrows()
+    ]
@@ -0,0 +1,28 @@
+# Flask/tests/test_admin_endpoints.py
+import pytest
+
+OPERATIONAL = ["/metrics", "/api/cache/stats", "/api/system/startup", "/api/system/memory", "/api/system/prefetch"]
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "admin-secret")
+    return "admin-secret"
+
+
+@pytest.mark.parametrize("path", OPERATIONAL)
+def test_operational_endpoints_need_the_admin_token(client, admin_token, path):
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get(path, headers={"X-Admin-Token": admin_token}).status_code == 200
+
+
+@pytest.mark.parametrize("path", OPERATIONAL)
+def test_operational_endpoints_are_closed_without_admin_token(client, monkeypatch, path):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.get(path, headers={"X-Admin-Token": ""}).status_code == 403
+
+
+def test_prometheus_can_scrape_with_a_bearer_token(client, admin_token):
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
@@ -0,0 +1,82 @@
+# Flask/tests/test_analysis.py
+import time
+
+import pytest
+
+from conftest import requires_crop_model, requires_yield_model
+
+
+@requires_crop_model
+@requires_yield_model
+def test_known_row_recommends_its_label(crop_rows):
+    from app.analysis import analyze_farm
+
+    # Every weather and soil field overridden: no upstream is called
+    for fields, label in crop_rows[::200]:
+        result = analyze_farm(18.52, 73.85, overrides=fields, k=3)
+        assert result["sources"] == {}
+        assert result["recommendations"][0]["crop"] == label
+
+
+@requires_crop_model
+@requires_yield_model
+def test_route_uses_same_row_as_predict(client, crop_rows):
+    fields, label = crop_rows[0]
+    analysis = client.post("/api/farm/analyze", json={"latitude": 18.52, "longitude": 73.85, "overrides": fields}).get_json()
+    predicted = client.post("/predict", json=fields).get_json()
+    assert [r["crop"] for r in analysis["recommendations"]] == [r["crop"] for r in predicted]
+    assert analysis["recommendations"][0]["crop"] == label
+
+
+@pytest.mark.parametrize("body", [
+    {"overrides": [1, 2, 3]},
+    {"overrides": "N=90"},
+    {"overrides": {"N": "lots"}},
+    {"deadline": "soon"},
+])
+def test_bad_inputs_are_rejected(client, body):
+    response = client.post("/api/farm/analyze", json={"latitude": 18.52, "longitude": 73.85, **body})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("raw", ["NaN", "Infinity", "-Infinity"])
+def test_non_finite_deadline_is_rejected(client, raw):
+    response = client.post(
+        "/api/farm/analyze", data=f'{{"deadline": {raw}}}', content_type="application/json",
+    )
+    assert response.status_code == 400
+
+
+@requires_crop_model
+@requires_yield_model
+@pytest.mark.parametrize("deadline", [-5, 0])
+def test_deadline_is_clamped_to_a_positive_minimum(monkeypatch, client, crop_rows, deadline):
+    from app import analysis
+
+    def slow_weather(latitude, longitude):
+        time.sleep(analysis.FARM_ANALYZE_MIN_DEADLINE + 1)
+        return analysis.WEATHER_FALLBACK
+
+    fields, _ = crop_rows[0]
+    soil_only = {field: fields[field] for field in analysis.SOIL_FIELDS}
+    monkeypatch.setattr(analysis, "fetch_weather_data", slow_weather)
+    started = time.perf_counter()
+    response = client.post("/api/farm/analyze", json={"overrides": soil_only, "deadline": deadline})
+    assert response.status_code == 200
+    assert response.get_json()["sources"]["weather"] == "timeout"
+    assert analysis.FARM_ANALYZE_MIN_DEADLINE <= time.perf_counter() - started < analysis.FARM_ANALYZE_MIN_DEADLINE + 1
+
+
+@requires_crop_model
+@requires_yield_model
+def test_weather_fallback_is_not_reported_live(monkeypatch, crop_rows):
+    from app import analysis
+    from app.services import _weather_response
+
+    fields, _ = crop_rows[0]
+    soil_only = {field: fields[field] for field in analysis.SOIL_FIELDS}
+    monkeypatch.setattr(
+        analysis, "fetch_weather_data",
+        lambda latitude, longitude: _weather_response({"current": None, "forecast_5day": None}),
+    )
+    assert analysis.analyze_farm(18.52, 73.85, overrides=soil_only)["sources"] == {"weather": "fallback"}
@@ -0,0 +1,57 @@
+# Flask/tests/test_answer_cache.py
+import subprocess
+import sys
+
+import pytest
+
+from conftest import FLASK_DIR
+from app.llm import answer_cache, answer_key
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "admin-secret")
+    return {"X-Admin-Token": "admin-secret"}
+
+
+def test_purge_in_another_worker_invalidates_this_one():
+    key = answer_key("groq", "Best fertilizer for rice?")
+    answer_cache.set(key, "Urea")
+    assert answer_cache.get(answer_key("groq", "best fertilizer for rice")) == "Urea"
+
+    # Another process on the host purges; this process's memory tier is untouched
+    subprocess.run(
+        [sys.executable, "-c", "from app.llm import purge_answers; purge_answers()"],
+        cwd=FLASK_DIR, check=True, capture_output=True,
+    )
+    assert answer_cache.get(answer_key("groq", "Best fertilizer for rice?")) is None
+
+
+def test_purge_route_bumps_generation(client, admin):
+    answer_cache.set(answer_key("groq", "When to sow wheat?"), "November")
+    before = client.delete("/api/agribot/cache", headers=admin).get_json()["generation"]
+    assert answer_cache.get(answer_key("groq", "When to sow wheat?")) is None
+    assert client.delete("/api/agribot/cache", headers=admin).get_json()["generation"] == before + 1
+
+
+@pytest.mark.parametrize("top", ["abc", "1.5", ""])
+def test_listing_rejects_non_integer_top(client, admin, top):
+    assert client.get(f"/api/agribot/cache?top={top}", headers=admin).status_code == 400
+
+
+def test_listing_requires_admin(client):
+    assert client.get("/api/agribot/cache").status_code == 403
+
+
+def test_back_to_back_purges_do_not_block(tmp_path):
+    from app.cache import CacheGeneration
+
+    path = str(tmp_path / "answers.generation")
+    with open(path, "w") as f:
+        f.write("5")
+    # A fresh worker whose first call is a purge, then a second with nothing between
+    generation = CacheGeneration("answers", path=path)
+    assert generation.bump() == 6
+    assert generation.bump() == 7
+    assert generation.current() == 7
+    assert CacheGeneration("answers", path=path).current() == 7
@@ -0,0 +1,72 @@
+# Flask/tests/test_auth.py
+import time
+import uuid
+
+import pytest
+from itsdangerous import URLSafeTimedSerializer
+
+from app import auth
+
+
+@pytest.fixture
+def account(client):
+    email = f"farmer-{uuid.uuid4().hex[:8]}@agrimind.test"
+    response = client.post("/farmer/register", json={"name": "Farmer", "email": email, "password": "right-pw"})
+    assert response.status_code == 201
+    return email
+
+
+def _login(client, email, password, token=None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return client.post("/farmer/login", json={"email": email, "password": password}, headers=headers)
+
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_login_always_checks_password(client, account):
+    token = _login(client, account, "right-pw").get_json()["token"]
+    response = _login(client, account, "wrong-pw", token=token)
+    assert response.status_code == 401
+    assert "token" not in response.get_json()
+
+
+def test_refresh_keeps_original_login_time(client, account):
+    token = _login(client, account, "right-pw").get_json()["token"]
+    response = client.post("/farmer/refresh", headers=_bearer(token))
+    assert response.status_code == 200
+    refreshed = response.get_json()["token"]
+
+    with client.application.app_context():
+        assert auth.verify_token(refreshed)["auth_time"] == auth.verify_token(token)["auth_time"]
+    assert client.get("/farmer/check-auth", headers=_bearer(refreshed)).status_code == 200
+
+
+def test_refresh_stops_at_max_session_age(client, account, monkeypatch):
+    token = _login(client, account, "right-pw").get_json()["token"]
+    later = time.time() + auth.SESSION_MAX_AGE + 1
+    monkeypatch.setattr(auth.time, "time", lambda: later)
+    assert client.post("/farmer/refresh", headers=_bearer(token)).status_code == 401
+    assert client.get("/farmer/check-auth", headers=_bearer(token)).status_code == 401
+
+
+def test_refresh_requires_token(client):
+    assert client.post("/farmer/refresh").status_code == 401
+
+
+@pytest.mark.parametrize("secret", ["dev-secret-key", ""])
+def test_default_secret_key_disables_tokens(app, client, account, monkeypatch, secret):
+    monkeypatch.setitem(app.config, "SECRET_KEY", secret)
+    forged = URLSafeTimedSerializer("dev-secret-key", salt=auth.TOKEN_SALT).dumps(
+        {"uid": 1, "email": account, "name": "Farmer", "auth_time": int(time.time())}
+    )
+    assert client.get("/farmer/check-auth", headers=_bearer(forged)).status_code == 401
+    assert _login(client, account, "right-pw").status_code == 503
+
+
+def test_token_signed_with_another_key_is_rejected(client, account):
+    forged = URLSafeTimedSerializer("dev-secret-key", salt=auth.TOKEN_SALT).dumps(
+        {"uid": 1, "email": account, "name": "Farmer", "auth_time": int(time.time())}
+    )
+    assert client.get("/farmer/check-auth", headers=_bearer(forged)).status_code == 401
@@ -0,0 +1,63 @@
+# Flask/tests/test_circuit.py
+import pytest
+import requests
+
+from app.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, is_upstream_failure
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(response=response)
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker("test", failure_threshold=2, reset_timeout=0)
+
+
+def test_opens_after_threshold_and_allows_one_trial():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_unexpected_error_in_trial_releases_it(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == HALF_OPEN
+
+    with pytest.raises(KeyError):
+        with breaker.attempt() as allowed:
+            assert allowed
+            raise KeyError("parsing bug")
+
+    # The next caller gets the trial instead of the circuit sticking half-open
+    with breaker.attempt() as allowed:
+        assert allowed
+        breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_only_one_trial_at_a_time(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    with breaker.attempt() as first:
+        with breaker.attempt() as second:
+            assert first and not second
+
+
+@pytest.mark.parametrize("error, counts", [
+    (_http_error(503), True),
+    (_http_error(500), True),
+    (_http_error(400), False),
+    (_http_error(404), False),
+    (requests.exceptions.ConnectionError(), True),
+    (requests.exceptions.ReadTimeout(), True),
+    (ValueError("bad json"), False),
+])
+def test_failure_classification(error, counts):
+    assert is_upstream_failure(error) is counts
@@ -0,0 +1,53 @@
+# Flask/tests/test_compiled_forest.py
+import tracemalloc
+
+import joblib
+import numpy as np
+import pytest
+
+from conftest import CROP_MODEL_PATH, YIELD_MODEL_PATH, requires_crop_model, requires_yield_model
+from ml.compiled_forest import CompiledForest, crop_dataset, yield_dataset
+
+TOLERANCE = 1e-9
+
+
+@pytest.fixture(scope="module")
+def crop_model():
+    return joblib.load(CROP_MODEL_PATH)
+
+
+def _top_k(probs, k=3):
+    return np.argsort(-probs, axis=1, kind="stable")[:, :k]
+
+
+@requires_crop_model
+@pytest.mark.parametrize("chunk_rows", [1, 7, 256])
+def test_crop_proba_and_top_k_match_sklearn(crop_model, chunk_rows):
+    X = crop_dataset()
+    compiled = CompiledForest.from_sklearn(crop_model)
+    compiled.chunk_rows = chunk_rows
+    sk_probs = crop_model.predict_proba(X)
+    compiled_probs = compiled.predict_proba(X)
+    assert np.max(np.abs(sk_probs - compiled_probs)) <= TOLERANCE
+    np.testing.assert_array_equal(_top_k(sk_probs), _top_k(compiled_probs))
+
+
+@requires_yield_model
+def test_yield_matches_sklearn():
+    model = joblib.load(YIELD_MODEL_PATH)
+    X = yield_dataset()
+    compiled = CompiledForest.from_sklearn(model)
+    assert np.max(np.abs(model.predict(X) - compiled.predict(X))) <= TOLERANCE
+
+
+@requires_crop_model
+def test_large_batch_memory_is_bounded(crop_model):
+    compiled = CompiledForest.from_sklearn(crop_model)
+    X = np.tile(crop_dataset(), (5, 1))[:10000]
+
+    tracemalloc.start()
+    compiled.predict_proba(X)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Gathering every (row, tree, class) leaf value at once took ~550 MB here
+    assert peak < 64 * 1024 * 1024
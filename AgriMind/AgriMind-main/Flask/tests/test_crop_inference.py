@@ -0,0 +1,46 @@
+# Flask/tests/test_crop_inference.py
+import joblib
+import numpy as np
+
+from conftest import CROP_MODEL_PATH, requires_crop_model
+
+
+def _baseline_top3(row):
+    """predict.py's original per-row path: sklearn predict_proba, sorted, first three."""
+    from ml.crop_recommender.predict import LE_PATH
+
+    model = joblib.load(CROP_MODEL_PATH)
+    le = joblib.load(LE_PATH)
+    probs = model.predict_proba(row)[0]
+    classes = le.inverse_transform(range(len(probs)))
+    return sorted(zip(classes, probs), key=lambda x: x[1], reverse=True)[:3]
+
+
+def test_predict_fields_follow_training_columns():
+    from app.inference import PREDICT_FIELDS
+    from ml.crop_recommender.model_training import FEATURES
+
+    assert [field.lower() for field in PREDICT_FIELDS] == [feature.lower() for feature in FEATURES]
+
+
+@requires_crop_model
+def test_batch_prediction_matches_baseline(client, crop_rows):
+    from app.inference import crop_feature_row
+
+    fields, label = crop_rows[0]
+    expected = _baseline_top3([crop_feature_row(fields)])
+    assert expected[0][0] == label
+
+    single = client.post("/predict", json=fields).get_json()
+    batch = client.post("/predict", json={"rows": [fields]}).get_json()["results"][0]
+    for result in (single, batch):
+        assert [r["crop"] for r in result] == [crop for crop, _ in expected]
+        np.testing.assert_allclose([r["prob"] for r in result], [prob for _, prob in expected], atol=1e-12)
+
+
+@requires_crop_model
+def test_training_rows_recommend_their_label(client, crop_rows):
+    sample = crop_rows[::100]
+    results = client.post("/predict", json={"rows": [fields for fields, _ in sample], "k": 1}).get_json()["results"]
+    hits = sum(result[0]["crop"] == label for result, (_, label) in zip(results, sample))
+    assert hits / len(sample) > 0.95
@@ -0,0 +1,54 @@
+# Flask/tests/test_database.py
+from sqlalchemy import event, text
+
+from app import database
+
+
+def test_sqlite_gets_a_lock_timeout_and_no_pool_sizing():
+    options = database.engine_options("sqlite:///agrimind.db")
+    assert options == {"connect_args": {"timeout": database.SQLITE_BUSY_TIMEOUT_MS / 1000}}
+
+
+def test_postgres_gets_a_bounded_checked_pool():
+    options = database.engine_options("postgresql+psycopg2://agrimind@db/agrimind")
+    assert options == {
+        "pool_size": database.DB_POOL_SIZE,
+        "max_overflow": database.DB_MAX_OVERFLOW,
+        "pool_timeout": database.DB_POOL_TIMEOUT,
+        "pool_recycle": database.DB_POOL_RECYCLE,
+        "pool_pre_ping": database.DB_POOL_PRE_PING,
+    }
+
+
+def test_every_sqlite_connection_gets_the_pragmas(app):
+    with app.app_context():
+        # A fresh connection, not one opened before the listener was added
+        database.db.engine.dispose()
+        with database.db.engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == database.SQLITE_JOURNAL_MODE.lower()
+            # NORMAL
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+
+
+def test_pragma_listener_is_registered_once(app):
+    database.configure_engine(app)
+    database.configure_engine(app)
+    with app.app_context():
+        assert event.contains(database.db.engine, "connect", database._set_sqlite_pragmas)
+        listeners = database.db.engine.pool.dispatch.connect
+        assert sum(1 for fn in listeners if fn is database._set_sqlite_pragmas) == 1
+
+
+def test_prebuilt_email_lookups(app):
+    from app.models import User, email_registered, find_user_by_email
+
+    with app.app_context():
+        user = User(name="Asha", email="asha.prepared@example.com")
+        user.set_password("monsoon-2026")
+        database.db.session.add(user)
+        database.db.session.commit()
+        assert find_user_by_email("asha.prepared@example.com").id == user.id
+        assert find_user_by_email("nobody@example.com") is None
+        assert email_registered("asha.prepared@example.com")
+        assert not email_registered("nobody@example.com")
@@ -0,0 +1,84 @@
+# Flask/tests/test_gemini_models.py
+import time
+
+import pytest
+
+from app import llm
+from app.circuit import CircuitBreaker
+from loadtest.fake_upstreams import build_profiles, start_server, upstream_env
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Fake Gemini that times out, with a fresh resolver and breaker."""
+    profiles = build_profiles({"gemini": 1.0}, jitter=0)
+    server = start_server(profiles=profiles)
+    monkeypatch.setattr(llm, "GEMINI_BASE_URL", upstream_env(server)["GEMINI_BASE_URL"])
+    monkeypatch.setattr(llm, "GEMINI_TIMEOUT", 0.2)
+    monkeypatch.setattr(llm, "gemini_models", llm.GeminiModelResolver(["model-a", "model-b", "model-c"]))
+    monkeypatch.setattr(llm, "gemini_breaker", CircuitBreaker("gemini-test", failure_threshold=3, reset_timeout=60))
+    yield profiles["gemini"]
+    server.shutdown()
+
+
+def test_outage_fails_fast_instead_of_trying_every_model(gemini):
+    started = time.perf_counter()
+    for _ in range(6):
+        with pytest.raises(llm.LLMError):
+            llm.gemini_generate("When to sow wheat?")
+    elapsed = time.perf_counter() - started
+
+    # One timed-out call per request until the circuit opens, then none
+    assert llm.gemini_breaker.state == "open"
+    assert elapsed < 3 * 0.2 + 1.0
+    assert llm.gemini_models.status()["failed"] == ["model-a", "model-b", "model-c"]
+
+
+def test_failed_model_is_skipped_briefly(gemini):
+    with pytest.raises(llm.LLMError):
+        llm.gemini_generate("When to sow wheat?")
+    assert llm.gemini_models.candidates() == ["model-b", "model-c"]
+
+
+def test_working_model_clears_failure(gemini):
+    gemini.latency = 0
+    llm.gemini_models.mark_failed("model-a")
+    assert llm.gemini_generate("When to sow wheat?")
+    assert llm.gemini_models.status()["resolved"] == "model-b"
+    assert llm.gemini_breaker.state == "closed"
+
+
+def test_transport_error_does_not_leak_the_api_key(monkeypatch, client, caplog):
+    from app import agribot
+
+    secret = "AIza-test-secret-key"
+    monkeypatch.setattr(llm, "GEMINI_API_KEY", secret)
+    monkeypatch.setattr(agribot, "GEMINI_API_KEY", secret)
+    # Nothing listens here, so the request fails with a connection error
+    monkeypatch.setattr(llm, "GEMINI_BASE_URL", "http://127.0.0.1:9/v1/models")
+    monkeypatch.setattr(llm, "gemini_models", llm.GeminiModelResolver(["model-a"]))
+    monkeypatch.setattr(llm, "gemini_breaker", CircuitBreaker("gemini-test"))
+
+    response = client.post("/api/ai/ask", json={"question": "Is the key in the URL?"})
+    assert response.status_code == 500
+    assert secret not in response.get_data(as_text=True)
+    assert secret not in caplog.text
+    assert "Gemini request" in caplog.text
+
+
+def test_api_key_is_sent_as_a_header(monkeypatch):
+    sent = {}
+
+    class Session:
+        def post(self, url, headers=None, **kwargs):
+            sent.update(url=url, headers=headers)
+            raise llm.requests.exceptions.ConnectionError(url)
+
+    monkeypatch.setattr(llm, "GEMINI_API_KEY", "header-key")
+    monkeypatch.setattr(llm, "get_session", Session)
+    monkeypatch.setattr(llm, "gemini_models", llm.GeminiModelResolver(["model-a"]))
+    monkeypatch.setattr(llm, "gemini_breaker", CircuitBreaker("gemini-test"))
+    with pytest.raises(llm.LLMError):
+        llm.gemini_generate("When to sow wheat?")
+    assert "key=" not in sent["url"]
+    assert sent["headers"]["x-goog-api-key"] == "header-key"
@@ -0,0 +1,40 @@
+# Flask/tests/test_history.py
+import pytest
+
+from conftest import requires_crop_model
+
+
+def _history_count(app):
+    from app.database import db
+    from app.models import PredictionHistory
+
+    with app.app_context():
+        return db.session.query(PredictionHistory).count()
+
+
+@requires_crop_model
+def test_batch_history_keeps_every_row(app, client, crop_rows):
+    rows = [fields for fields, _ in crop_rows[:300]]
+    before = _history_count(app)
+    response = client.post("/predict", json={"rows": rows})
+    assert len(response.get_json()["results"]) == len(rows)
+    assert _history_count(app) == before + len(rows)
+
+    client.post("/predict", json=rows[0])
+    assert _history_count(app) == before + len(rows) + 1
+
+
+@requires_crop_model
+def test_history_pages_follow_the_cursor(client, crop_rows):
+    client.post("/predict", json={"rows": [fields for fields, _ in crop_rows[:5]]})
+    first = client.get("/history?limit=2").get_json()
+    second = client.get(f"/history?limit=2&cursor={first['next_cursor']}").get_json()
+    assert len(first["items"]) == len(second["items"]) == 2
+    assert not {item["id"] for item in first["items"]} & {item["id"] for item in second["items"]}
+
+
+@pytest.mark.parametrize("cursor", ["abc", "1.5", "", "0", "-3"])
+def test_history_rejects_unreadable_cursor(client, cursor):
+    response = client.get(f"/history?cursor={cursor}")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid cursor"
@@ -0,0 +1,71 @@
+# Flask/tests/test_history_export.py
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+# Rows are written far in the future so ?since= isolates them from other tests' history
+START = datetime(2099, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def exported_rows(app):
+    from app.database import db
+    from app.models import PredictionHistory
+
+    rows = [
+        {
+            "public_id": f"export-{i:04d}",
+            "created_at": START + timedelta(minutes=i),
+            "recommendations": [{"crop": "rice", "prob": 0.7}, {"crop": "maize", "prob": 0.2}],
+        }
+        for i in range(25)
+    ]
+    with app.app_context():
+        db.session.execute(db.insert(PredictionHistory), rows)
+        db.session.commit()
+    return rows
+
+
+def _since(rows, i=0):
+    return rows[i]["created_at"].isoformat()
+
+
+def test_ndjson_streams_every_row_oldest_first(client, exported_rows, monkeypatch):
+    import app as app_module
+
+    # Several server-side batches for one export
+    monkeypatch.setattr(app_module, "HISTORY_EXPORT_BATCH", 4)
+    response = client.get(f"/history/export?since={_since(exported_rows)}")
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["id"] for line in lines] == [row["public_id"] for row in exported_rows]
+    assert lines[0]["recommendations"][0] == {"crop": "rice", "prob": 0.7}
+
+
+def test_csv_has_one_line_per_recommended_crop(client, exported_rows):
+    response = client.get(f"/history/export?format=csv&since={_since(exported_rows)}")
+    assert response.mimetype == "text/csv"
+    assert "attachment" in response.headers["Content-Disposition"]
+
+    lines = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert lines[0] == ["id", "timestamp", "rank", "crop", "prob"]
+    assert len(lines) == 1 + 2 * len(exported_rows)
+    assert lines[1] == ["export-0000", START.isoformat(), "1", "rice", "0.7"]
+    assert lines[2][2:4] == ["2", "maize"]
+
+
+def test_since_is_inclusive_and_until_exclusive(client, exported_rows):
+    response = client.get(f"/history/export?since={_since(exported_rows, 5)}&until={_since(exported_rows, 10)}")
+    ids = [json.loads(line)["id"] for line in response.get_data(as_text=True).splitlines()]
+    assert ids == [row["public_id"] for row in exported_rows[5:10]]
+
+
+@pytest.mark.parametrize("query", ["format=xml", "since=yesterday", "until=2099-13-01"])
+def test_bad_parameters_are_rejected(client, query):
+    assert client.get(f"/history/export?{query}").status_code == 400
@@ -0,0 +1,23 @@
+# Flask/tests/test_prediction_cache.py
+from conftest import requires_crop_model
+
+
+def test_inputs_are_not_quantized_by_default():
+    from app.inference import QUANTIZE_INPUTS, quantize
+
+    assert not QUANTIZE_INPUTS
+    assert quantize([90.123456, 6.5012], ["N", "pH"]) == [90.123456, 6.5012]
+
+
+@requires_crop_model
+def test_cached_predictions_match_raw_model(crop_rows):
+    from app.inference import PREDICT_FIELDS, quantize, recommend_crops
+    from ml.crop_recommender import predict
+
+    rows = [[fields[field] for field in PREDICT_FIELDS] for fields, _ in crop_rows]
+    assert [quantize(row, PREDICT_FIELDS) for row in rows] == rows
+
+    raw = predict.predict_top_crops_batch(rows, k=3)
+    assert recommend_crops(rows, k=3) == raw
+    # Second pass is served from the cache
+    assert recommend_crops(rows, k=3) == raw
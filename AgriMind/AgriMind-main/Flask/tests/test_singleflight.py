@@ -0,0 +1,50 @@
+# Flask/tests/test_singleflight.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight("test")
+    calls = []
+    release = threading.Event()
+
+    def fetch(key):
+        calls.append(key)
+        release.wait(5)
+        return {"cell": key}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flights.do, "soil:1:2", fetch, "soil:1:2") for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert calls == ["soil:1:2"]
+    assert all(result is results[0] for result in results)
+    assert flights.in_flight() == 0
+
+
+def test_followers_get_the_leaders_exception():
+    flights = SingleFlight("test")
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flights.do, "k", fail)
+        started.wait(5)
+        follower = pool.submit(flights.do, "k", fail)
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="upstream down"):
+                future.result()
+
+    # The next call runs again instead of replaying the failure
+    assert flights.do("k", lambda: "ok") == "ok"
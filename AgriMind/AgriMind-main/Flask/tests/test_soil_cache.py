@@ -0,0 +1,158 @@
+# Flask/tests/test_soil_cache.py
+import logging
+import math
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import FLASK_DIR
+from app.cache import LRUCache, SQLiteCache, TieredCache
+
+
+def _unopenable_path(tmp_path):
+    # A regular file where the cache directory should be: nothing can be created under it
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    return str(blocker / "soil.sqlite")
+
+
+def test_unopenable_file_turns_the_sqlite_tier_into_a_no_op(tmp_path, caplog):
+    cache = SQLiteCache("soil-test", _unopenable_path(tmp_path))
+    with caplog.at_level(logging.WARNING, logger="app.cache"):
+        cache.set("soil:1:2", {"pH": 6.5})
+    assert not cache.available
+    assert "continuing without it" in caplog.text
+
+    assert cache.get("soil:1:2") is None
+    cache.delete("soil:1:2")
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.top() == []
+    assert cache.stats()["available"] is False
+
+
+def test_tiered_cache_falls_back_to_memory(tmp_path):
+    cache = TieredCache("soil-test", LRUCache("soil-test"), SQLiteCache("soil-test", _unopenable_path(tmp_path)))
+    cache.set("soil:1:2", {"pH": 6.5})
+    assert cache.get("soil:1:2") == {"pH": 6.5}
+    assert len(cache) == 1
+    assert cache.top() == [("soil:1:2", 1)]
+
+
+def test_importing_services_does_not_touch_the_cache_dir(tmp_path):
+    env = dict(os.environ, CACHE_DIR=str(tmp_path / "cache"))
+    env.pop("SOIL_CACHE_PATH", None)
+    subprocess.run(
+        [sys.executable, "-c", "import app.services"],
+        cwd=FLASK_DIR, env=env, check=True, capture_output=True,
+    )
+    assert not (tmp_path / "cache").exists()
+
+
+# -----------------------------
+# 250 m grid snapping
+# -----------------------------
+def _ground_meters(lat1, lon1, lat2, lon2):
+    from app.services import METERS_PER_DEGREE_LAT
+
+    dy = (lat2 - lat1) * METERS_PER_DEGREE_LAT
+    dx = (lon2 - lon1) * METERS_PER_DEGREE_LAT * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(dx, dy)
+
+
+@pytest.mark.parametrize("lat, lon", [(18.5204, 73.8567), (-33.9, 18.4), (64.1, -21.9), (0.0001, -0.0001)])
+def test_points_snap_to_the_centre_of_their_cell(lat, lon):
+    from app.services import SOIL_CELL_METERS, snap_to_soil_cell
+
+    cell_id, cell_lat, cell_lon = snap_to_soil_cell(lat, lon)
+    # Within half a cell diagonal of the centre, and the centre maps to the same cell
+    assert _ground_meters(lat, lon, cell_lat, cell_lon) <= SOIL_CELL_METERS / math.sqrt(2) + 1
+    assert snap_to_soil_cell(cell_lat, cell_lon)[0] == cell_id
+
+
+def _next_cell(cell_lat, cell_lon, dlat, dlon):
+    """Centre of the first different cell reached walking from a centre in ~10 m steps."""
+    from app.services import METERS_PER_DEGREE_LAT, snap_to_soil_cell
+
+    start = snap_to_soil_cell(cell_lat, cell_lon)[0]
+    step = 10 / METERS_PER_DEGREE_LAT
+    lat, lon = cell_lat, cell_lon
+    while True:
+        lat += dlat * step
+        lon += dlon * step / math.cos(math.radians(cell_lat))
+        cell_id, next_lat, next_lon = snap_to_soil_cell(lat, lon)
+        if cell_id != start:
+            return next_lat, next_lon
+
+
+@pytest.mark.parametrize("lat", [0.0, 18.5, 45.0, 70.0])
+def test_cells_are_about_250m_on_the_ground_at_any_latitude(lat):
+    from app.services import SOIL_CELL_METERS, snap_to_soil_cell
+
+    _, cell_lat, cell_lon = snap_to_soil_cell(lat, 10.0)
+    for dlat, dlon in ((1, 0), (0, 1)):
+        next_lat, next_lon = _next_cell(cell_lat, cell_lon, dlat, dlon)
+        assert _ground_meters(cell_lat, cell_lon, next_lat, next_lon) == pytest.approx(SOIL_CELL_METERS, rel=0.02)
+
+
+# -----------------------------
+# SQLite tier and TieredCache
+# -----------------------------
+def test_sqlite_tier_persists_across_instances(tmp_path):
+    path = str(tmp_path / "soil.sqlite")
+    SQLiteCache("soil-test", path).set("soil:1:2", {"pH": 6.5, "source": "SOILGRIDS"})
+    # A restarted worker (new instance, same file) sees the entry
+    cache = SQLiteCache("soil-test", path)
+    assert cache.get("soil:1:2") == {"pH": 6.5, "source": "SOILGRIDS"}
+    assert len(cache) == 1
+    assert cache.top() == [("soil:1:2", 1)]
+
+
+def test_sqlite_tier_honours_ttl_and_maxsize(tmp_path):
+    cache = SQLiteCache("soil-test", str(tmp_path / "soil.sqlite"), ttl=60, maxsize=2)
+    cache.set("expired", 1, ttl=-1)
+    assert cache.get("expired") is None
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+        time.sleep(0.01)
+    assert len(cache) == 2
+    assert cache.get("a") is None and cache.get("c") == "c"
+
+
+def test_backend_hit_fills_the_memory_tier(tmp_path):
+    backend = SQLiteCache("soil-test", str(tmp_path / "soil.sqlite"))
+    backend.set("soil:1:2", {"pH": 6.5})
+    memory = LRUCache("soil-test")
+    cache = TieredCache("soil-test", memory, backend)
+    assert cache.get("soil:1:2") == {"pH": 6.5}
+    assert memory.get("soil:1:2") == {"pH": 6.5}
+
+
+@pytest.fixture
+def soilgrids(monkeypatch, tmp_path):
+    from app import services
+    from loadtest.fake_upstreams import build_profiles, start_server, upstream_env
+
+    profiles = build_profiles({"soilgrids": 0.0}, jitter=0)
+    server = start_server(profiles=profiles)
+    monkeypatch.setattr(services, "SOILGRIDS_URL", upstream_env(server)["SOILGRIDS_URL"])
+    monkeypatch.setattr(services, "soil_cache", TieredCache(
+        "soilgrids", LRUCache("soilgrids"), SQLiteCache("soilgrids", str(tmp_path / "soil.sqlite")),
+    ))
+    yield profiles["soilgrids"]
+    server.shutdown()
+
+
+def test_points_in_one_cell_share_one_soilgrids_call(soilgrids):
+    from app.services import fetch_soil_data, snap_to_soil_cell
+
+    _, cell_lat, cell_lon = snap_to_soil_cell(18.5204, 73.8567)
+    first = fetch_soil_data(cell_lat, cell_lon)
+    # ~50 m away, same cell
+    assert fetch_soil_data(cell_lat + 0.0004, cell_lon - 0.0004) == first
+    assert first["source"] == "SOILGRIDS"
+    # pH and nitrogen came back from one multi-property request
+    assert soilgrids.requests == 1
@@ -0,0 +1,106 @@
+# Flask/tests/test_streaming.py
+import json
+
+import pytest
+
+from app import agribot, llm, routes
+from app.circuit import CircuitBreaker
+from loadtest.fake_upstreams import ANSWER, build_profiles, start_server, upstream_env
+
+
+@pytest.fixture
+def upstreams(monkeypatch):
+    """Fake Groq and Gemini, answering ANSWER token by token."""
+    profiles = build_profiles({"groq": 0.0, "gemini": 0.0}, jitter=0, token_delay=0)
+    server = start_server(profiles=profiles)
+    env = upstream_env(server)
+    monkeypatch.setattr(llm, "GROQ_URL", env["GROQ_URL"])
+    monkeypatch.setattr(llm, "GEMINI_BASE_URL", env["GEMINI_BASE_URL"])
+    monkeypatch.setattr(routes, "GROQ_API_KEY", env["GROQ_API_KEY"])
+    monkeypatch.setattr(agribot, "GEMINI_API_KEY", env["GEMINI_API_KEY"])
+    monkeypatch.setattr(llm, "gemini_models", llm.GeminiModelResolver(["model-a"]))
+    monkeypatch.setattr(llm, "gemini_breaker", CircuitBreaker("gemini-test"))
+    yield profiles
+    server.shutdown()
+
+
+def _sse_events(response):
+    """[(event, payload)] of a text/event-stream body."""
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        event, data = "message", None
+        for line in block.splitlines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+@pytest.mark.parametrize("path, question", [
+    ("/api/agribot", "How deep should I sow groundnut?"),
+    ("/api/ai/ask", "How deep should I plant groundnut seeds?"),
+])
+def test_sse_streams_tokens_then_done(client, upstreams, path, question):
+    response = client.post(path, json={"question": question, "stream": True})
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    events = _sse_events(response)
+    tokens = [data["token"] for event, data in events if event == "message"]
+    assert len(tokens) == len(ANSWER.split(" "))
+    assert "".join(tokens) == ANSWER
+    assert events[-1] == ("done", {"done": True, "answer": ANSWER})
+
+
+def test_accept_header_requests_a_stream(client, upstreams):
+    response = client.post(
+        "/api/agribot", json={"question": "Is it too late to sow mustard?"},
+        headers={"Accept": "text/event-stream"},
+    )
+    assert response.mimetype == "text/event-stream"
+
+
+def test_ndjson_streams_lines(client, upstreams):
+    response = client.post(
+        "/api/agribot?format=ndjson", json={"question": "Which rice variety for saline soil?", "stream": True},
+    )
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert "".join(line["token"] for line in lines[:-1]) == ANSWER
+    assert lines[-1] == {"done": True, "answer": ANSWER}
+
+
+def test_streamed_answer_is_cached(client, upstreams):
+    body = {"question": "How often to water chilli seedlings?", "stream": True}
+    client.post("/api/agribot", json=body).get_data()
+    assert upstreams["groq"].requests == 1
+
+    # Served whole from the cache, without calling Groq again
+    again = client.post("/api/agribot?format=ndjson", json=body)
+    lines = [json.loads(line) for line in again.get_data(as_text=True).splitlines()]
+    assert lines == [{"token": ANSWER}, {"done": True, "answer": ANSWER}]
+    assert client.post("/api/agribot", json={**body, "stream": False}).get_json() == {"answer": ANSWER}
+    assert upstreams["groq"].requests == 1
+
+
+def test_upstream_error_before_streaming_is_a_plain_error(client, upstreams):
+    upstreams["groq"].error_rate = 1.0
+    response = client.post("/api/agribot", json={"question": "Why are my wheat leaves yellow?", "stream": True})
+    assert response.status_code == 500
+    assert response.mimetype == "application/json"
+
+
+def test_failure_mid_stream_ends_with_an_error_event(app):
+    def tokens():
+        yield "Sow"
+        raise llm.requests.exceptions.ChunkedEncodingError("connection to http://upstream?key=secret broken")
+
+    with app.test_request_context():
+        body = "".join(llm.stream_response(tokens()).response)
+    assert 'data: {"token": "Sow"}' in body
+    assert "event: error" in body
+    assert "secret" not in body
+    assert "event: done" not in body
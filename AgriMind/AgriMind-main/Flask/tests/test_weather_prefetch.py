@@ -0,0 +1,47 @@
+# Flask/tests/test_weather_prefetch.py
+import pytest
+
+from app import services
+from app.cache import LRUCache
+from loadtest.fake_upstreams import build_profiles, start_server, upstream_env
+
+
+@pytest.fixture
+def open_meteo(monkeypatch):
+    profiles = build_profiles({"openmeteo": 0.0}, jitter=0)
+    server = start_server(profiles=profiles)
+    monkeypatch.setattr(services, "OPEN_METEO_URL", upstream_env(server)["OPEN_METEO_URL"])
+    yield profiles["openmeteo"]
+    server.shutdown()
+
+
+def _lookups():
+    return sum(cache.hits + cache.misses for cache, _ in services.WEATHER_SECTIONS.values())
+
+
+def test_peek_does_not_touch_stats():
+    cache = LRUCache("peek-test", ttl=60)
+    cache.set("a", 1)
+    assert cache.peek("a") == 1 and cache.peek("b") is None
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_due_check_does_not_count_as_lookup(open_meteo):
+    bucket_key, lat, lon = services.snap_to_weather_grid(-33.9, 18.4)
+    services.fetch_weather_data(-33.9, 18.4)
+
+    before = _lookups()
+    assert not services.weather_refresh_due(bucket_key, 0)
+    assert services.weather_refresh_due(bucket_key, services.WEATHER_FORECAST_TTL + 1)
+    assert _lookups() == before
+
+
+def test_prefetch_refreshes_before_expiry(open_meteo):
+    bucket_key, lat, lon = services.snap_to_weather_grid(-1.29, 36.82)
+    services.fetch_weather_data(-1.29, 36.82)
+    requests_before = open_meteo.requests
+
+    lead = services.WEATHER_CURRENT_TTL + 1
+    services._refresh_weather(bucket_key, lat, lon, lead)
+    assert open_meteo.requests == requests_before + 1
+    assert not services.weather_refresh_due(bucket_key, 0)
@@ -118,7 +118,7 @@ const HistoryPanel = ({ history }: { history?: any[] }) => {
         {history.map((item) => {
           const firstRecommendation = item.recommendations?.[0];
           return (
-            <li key={item._id} className="flex justify-between items-center bg-gray-50 dark:bg-gray-700 p-2 rounded-md">
+            <li key={item.id} className="flex justify-between items-center bg-gray-50 dark:bg-gray-700 p-2 rounded-md">
               <span className="font-medium capitalize">{firstRecommendation?.crop || 'N/A'}</span>
               <span className="text-xs text-gray-500 dark:text-gray-400">{formatTimestamp(item.timestamp)}</span>
             </li>
@@ -183,8 +183,9 @@ function CropRecommender() {
 
   const fetchHistory = async () => {
     try {
-      const response = await axios.get(`${API_URL}/history`);
-      setHistory(response.data?.slice().reverse() || []);
+      // Paginated, newest first: { items, next_cursor }
+      const response = await axios.get(`${API_URL}/history`, { params: { limit: 20 } });
+      setHistory(response.data?.items || []);
     } catch (err) {
       console.error("Error fetching history:", err);
       setHistory([]);
@@ -68,7 +68,8 @@ export default function VoiceAssistant({
 
       if (status === "recording") stop();
 
-      const res = await fetch(`${API_BASE}/api/agribot`, {
+      // Stream tokens (NDJSON) so the answer appears as it is generated
+      const res = await fetch(`${API_BASE}/api/agribot?format=ndjson`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -77,16 +78,39 @@ export default function VoiceAssistant({
           question: q,
           replyMode,
           userLang: inputLang,
+          stream: true,
         }),
       });
 
-      const data = await res.json();
-
-      if (!res.ok) {
+      if (!res.ok || !res.body) {
+        const data = await res.json().catch(() => null);
         throw new Error(data?.error || "AgriBot failed");
       }
 
-      setAnswer(data.answer || "No response from AgriBot");
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let text = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.error) throw new Error(event.error);
+          if (event.token) {
+            text += event.token;
+            setAnswer(text);
+          }
+        }
+      }
+
+      if (!text) setAnswer("No response from AgriBot");
     } catch (e: any) {
       setAnswer(e?.message || "Failed to get answer");
     } finally {
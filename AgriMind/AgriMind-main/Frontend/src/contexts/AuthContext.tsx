@@ -36,8 +36,9 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   }
 
   try {
-    const response = await fetch(`${API_BASE}/farmer/check-auth`, {
-      method: 'GET',
+    // Exchanges a still-valid token for a fresh one (never past the server's max session age)
+    const response = await fetch(`${API_BASE}/farmer/refresh`, {
+      method: 'POST',
       headers: {
         Authorization: `Bearer ${token}`,
         'Content-Type': 'application/json',
@@ -49,6 +50,8 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
     }
 
     // Token is valid
+    const data = await response.json();
+    localStorage.setItem(AUTH_TOKEN_KEY, data.token);
     setIsAuthenticated(true);
   } catch (error) {
     console.error('Auth verification failed:', error);
@@ -80,9 +83,9 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
         throw new Error(message);
       }
       
-      // Generate a simple token (in production, use JWT from backend)
-      const token = `${email}_${Date.now()}`;
-      localStorage.setItem(AUTH_TOKEN_KEY, token);
+      // Signed, expiring session token issued by the backend
+      const data = await response.json();
+      localStorage.setItem(AUTH_TOKEN_KEY, data.token);
       setIsAuthenticated(true);
       navigate('/');
     } catch (error) {